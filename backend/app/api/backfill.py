@@ -0,0 +1,109 @@
+"""Historical backfill API endpoints"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.services.backfill_service import DEFAULT_CHUNK_DAYS, BackfillService, with_progress
+from app.services.database import db
+from app.services.job_service import job_queue
+
+router = APIRouter()
+
+
+class BackfillRequest(BaseModel):
+    start_date: str
+    end_date: str
+    urls: dict[str, str] = {}
+    raw_path: str
+    direction: str = "newest_first"
+    chunk_days: int = DEFAULT_CHUNK_DAYS
+
+
+class BackfillResponse(BaseModel):
+    success: bool
+    backfill: dict | None = None
+    error: str | None = None
+
+
+class BackfillListResponse(BaseModel):
+    success: bool
+    backfills: list[dict]
+    error: str | None = None
+
+
+async def _start(backfill_id: int) -> dict:
+    """Queue a job that runs the backfill from its cursor"""
+    job_id = await job_queue.submit("backfill", {"backfill_id": backfill_id})
+    await db.aio.update_backfill(backfill_id, status="queued", job_id=job_id)
+    return with_progress(await db.aio.get_backfill(backfill_id))
+
+
+@router.post("/", response_model=BackfillResponse)
+async def create_backfill(request: BackfillRequest):
+    """Start a checkpointed backfill of a long date range in the background"""
+    try:
+        backfill_id = await BackfillService().create(
+            start_date=request.start_date,
+            end_date=request.end_date,
+            urls=request.urls,
+            raw_path=request.raw_path,
+            direction=request.direction,
+            chunk_days=request.chunk_days,
+        )
+        return BackfillResponse(success=True, backfill=await _start(backfill_id))
+    except Exception as e:
+        return BackfillResponse(success=False, error=str(e))
+
+
+@router.get("/", response_model=BackfillListResponse)
+async def list_backfills(limit: int = 100):
+    """List backfills with progress, newest first"""
+    try:
+        backfills = [
+            with_progress(backfill) for backfill in await db.aio.list_backfills(limit=limit)
+        ]
+        return BackfillListResponse(success=True, backfills=backfills)
+    except Exception as e:
+        return BackfillListResponse(success=False, backfills=[], error=str(e))
+
+
+@router.get("/{backfill_id}", response_model=BackfillResponse)
+async def get_backfill(backfill_id: int):
+    """Get a backfill's progress, throughput and ETA"""
+    backfill = await db.aio.get_backfill(backfill_id)
+    if not backfill:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    return BackfillResponse(success=True, backfill=with_progress(backfill))
+
+
+@router.post("/{backfill_id}/pause", response_model=BackfillResponse)
+async def pause_backfill(backfill_id: int):
+    """Stop a backfill after saving its cursor; resume continues from there"""
+    backfill = await db.aio.get_backfill(backfill_id)
+    if not backfill:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    if backfill["status"] not in ("queued", "running"):
+        return BackfillResponse(
+            success=False, backfill=with_progress(backfill), error="Backfill is not running"
+        )
+
+    await db.aio.update_backfill(backfill_id, status="paused")
+    await job_queue.cancel(backfill["job_id"])
+    return BackfillResponse(
+        success=True, backfill=with_progress(await db.aio.get_backfill(backfill_id))
+    )
+
+
+@router.post("/{backfill_id}/resume", response_model=BackfillResponse)
+async def resume_backfill(backfill_id: int):
+    """Resume a paused or failed backfill from its cursor"""
+    backfill = await db.aio.get_backfill(backfill_id)
+    if not backfill:
+        raise HTTPException(status_code=404, detail="Backfill not found")
+    if backfill["status"] not in ("paused", "failed"):
+        return BackfillResponse(
+            success=False,
+            backfill=with_progress(backfill),
+            error=f"Backfill is {backfill['status']}",
+        )
+    return BackfillResponse(success=True, backfill=await _start(backfill_id))
@@ -1,13 +1,46 @@
 """Download API endpoints with individual file support and retry"""
 
-from fastapi import APIRouter, HTTPException
+from datetime import date
+
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 
 from app.services.database import db
 from app.services.download_service import DownloadService
+from app.services.job_service import job_queue
+from app.services.progress_registry import progress_registry
+from app.services.rate_limiter import Priority
 
 router = APIRouter()
 
+# Listed by /download/status when no filter is given
+ACTIVE_STATUSES = ("pending", "downloading", "failed")
+
+# Rows per /download/status page
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Fields returned by /download/status unless others are requested
+STATUS_FIELDS = (
+    "id",
+    "file_name",
+    "file_type",
+    "url",
+    "date_str",
+    "file_path",
+    "status",
+    "progress",
+    "error_message",
+    "retry_count",
+    "bytes_downloaded",
+    "sha256",
+    "size_bytes",
+    "http_status",
+    "created_at",
+    "updated_at",
+    "completed_at",
+)
+
 
 class DownloadRequest(BaseModel):
     start_date: str
@@ -30,8 +63,10 @@ class RetryDownloadRequest(BaseModel):
 
 class DownloadResponse(BaseModel):
     success: bool
-    downloaded: list[str]
-    missing: list[str]
+    job_id: int | None = None
+    status: str | None = None
+    downloaded: list[str] = []
+    missing: list[str] = []
     error: str | None = None
 
 
@@ -46,32 +81,61 @@ class SingleFileDownloadResponse(BaseModel):
 class DownloadStatusResponse(BaseModel):
     success: bool
     downloads: list[dict]
+    next_cursor: str | None = None
+    error: str | None = None
+
+
+class DownloadChangesResponse(BaseModel):
+    success: bool
+    revision: int = 0
+    reset: bool = False
+    downloads: list[dict] = []
+    deleted: list[int] = []
+    active: int | None = None
+    error: str | None = None
+
+
+class DownloadSummaryResponse(BaseModel):
+    success: bool
+    total: int = 0
+    by_status: dict[str, int] = {}
+    by_file_type: dict[str, dict[str, int]] = {}
+    by_date: dict[str, dict[str, int]] = {}
     error: str | None = None
 
 
+def _split(value: str | None) -> list[str] | None:
+    """Parse a comma-separated query parameter"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 @router.post("/", response_model=DownloadResponse)
 async def download_files(request: DownloadRequest):
-    """Download NSE files for the given date range"""
+    """Queue a download of NSE files for the given date range
+
+    Returns the job ID immediately; the downloaded/missing lists are
+    available from /jobs/{job_id} once the job has completed.
+    """
     try:
-        service = DownloadService()
-        result = await service.download_files(
-            start_date=request.start_date,
-            end_date=request.end_date,
-            urls=request.urls,
-            raw_path=request.raw_path,
-        )
-        return DownloadResponse(
-            success=True, downloaded=result.get("downloaded", []), missing=result.get("missing", [])
-        )
+        date.fromisoformat(request.start_date)
+        date.fromisoformat(request.end_date)
+        job_id = await job_queue.submit("download", request.model_dump())
+        return DownloadResponse(success=True, job_id=job_id, status="queued")
     except Exception as e:
-        return DownloadResponse(success=False, downloaded=[], missing=[], error=str(e))
+        return DownloadResponse(success=False, error=str(e))
 
 
 @router.post("/single", response_model=SingleFileDownloadResponse)
 async def download_single_file(request: SingleFileDownloadRequest):
-    """Download a single file with progress tracking"""
+    """Download a single file with progress tracking
+
+    Requests wait in the interactive lane of the rate limiter, ahead of
+    scheduled and backfill downloads.
+    """
     try:
-        service = DownloadService()
+        service = DownloadService(priority=Priority.INTERACTIVE)
         result = await service.download_single_file(
             file_type=request.file_type,
             date_str=request.date_str,
@@ -86,9 +150,9 @@ async def download_single_file(request: SingleFileDownloadRequest):
 
 @router.post("/retry", response_model=SingleFileDownloadResponse)
 async def retry_download(request: RetryDownloadRequest):
-    """Retry a failed download"""
+    """Retry a failed download in the interactive lane of the rate limiter"""
     try:
-        service = DownloadService()
+        service = DownloadService(priority=Priority.INTERACTIVE)
         result = await service.retry_download(request.download_id)
         return SingleFileDownloadResponse(**result)
     except Exception as e:
@@ -97,52 +161,131 @@ async def retry_download(request: RetryDownloadRequest):
 
 @router.get("/status", response_model=DownloadStatusResponse)
 async def get_download_status(
-    start_date: str | None = None, end_date: str | None = None, status: str | None = None
+    *,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    status: str | None = None,
+    file_type: str | None = None,
+    fields: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
 ):
-    """Get download status"""
+    """Get a page of downloads, newest date first
+
+    ``status`` and ``file_type`` take comma-separated lists and combine with
+    the date range in one query; without any filter the pending, downloading
+    and failed downloads are listed. ``fields`` picks the columns returned.
+    While a page is full, ``next_cursor`` is set; pass it back as ``cursor``
+    to get the next one.
+    """
     try:
-        if status:
-            downloads = db.get_downloads_by_status(status)
-        elif start_date and end_date:
-            downloads = db.get_downloads_by_date_range(start_date, end_date)
-        else:
-            downloads = (
-                db.get_downloads_by_status("pending")
-                + db.get_downloads_by_status("downloading")
-                + db.get_downloads_by_status("failed")
-            )
-
-        # Convert to dict list
-        download_list = []
-        for d in downloads:
-            download_dict = {
-                "id": d["id"],
-                "file_name": d["file_name"],
-                "file_type": d["file_type"],
-                "url": d["url"],
-                "date_str": d["date_str"],
-                "file_path": d["file_path"],
-                "status": d["status"],
-                "progress": d["progress"],
-                "error_message": d["error_message"],
-                "retry_count": d["retry_count"],
-                "created_at": d["created_at"],
-                "updated_at": d["updated_at"],
-                "completed_at": d["completed_at"],
-            }
-            download_list.append(download_dict)
-
-        return DownloadStatusResponse(success=True, downloads=download_list)
+        statuses = _split(status)
+        file_types = _split(file_type)
+        if not (statuses or file_types or start_date or end_date):
+            statuses = list(ACTIVE_STATUSES)
+
+        after = tuple(cursor.split("|", 1)) if cursor else None
+        if after is not None and len(after) != 2:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+        requested = _split(fields) or list(STATUS_FIELDS)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        downloads = await db.aio.query_downloads(
+            statuses=statuses,
+            file_types=file_types,
+            start_date=start_date,
+            end_date=end_date,
+            after=after,
+            limit=limit,
+            # The key columns are needed for the cursor and the live progress overlay
+            fields=list(dict.fromkeys([*requested, "id", "status", "date_str", "file_type"])),
+        )
+
+        next_cursor = None
+        if len(downloads) == limit:
+            next_cursor = f"{downloads[-1]['date_str']}|{downloads[-1]['file_type']}"
+
+        # Live progress for active downloads, then only the requested fields
+        download_list = [
+            {field: d[field] for field in requested}
+            for d in map(progress_registry.overlay, downloads)
+        ]
+        return DownloadStatusResponse(
+            success=True, downloads=download_list, next_cursor=next_cursor
+        )
     except Exception as e:
         return DownloadStatusResponse(success=False, downloads=[], error=str(e))
 
 
+@router.get("/changes", response_model=DownloadChangesResponse)
+async def get_download_changes(
+    since: int = 0,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    fields: str | None = None,
+):
+    """Get downloads changed after revision ``since``
+
+    Clients poll with the ``revision`` of the previous answer, so each poll
+    costs as much as what changed. When nothing did, the answer is an empty
+    304. Downloads in progress are always included, with live progress.
+    ``reset`` is set when ``since`` is ahead of the database, for example
+    after it was replaced, or so far behind that retention has pruned the
+    deletions after it; the client should then drop what it has.
+    ``active`` counts pending and downloading rows as of the same snapshot,
+    so a client can stop polling once it is 0 (it is null while more pages
+    of changes are pending).
+    """
+    try:
+        changes = await db.aio.get_download_changes(since, start_date=start_date, end_date=end_date)
+        reset = since > changes["revision"] or changes["stale"]
+        if reset:
+            changes = await db.aio.get_download_changes(0, start_date=start_date, end_date=end_date)
+
+        changed = {d["id"] for d in changes["downloads"]}
+        live = [i for i in progress_registry.active_ids() if i not in changed]
+        for d in await db.aio.get_downloads_by_ids(live):
+            if (start_date or "") <= d["date_str"] <= (end_date or "9999-12-31"):
+                changes["downloads"].append(d)
+
+        etag = f'"{changes["revision"]}"'
+        if not reset and not changes["downloads"] and not changes["deleted"]:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        requested = _split(fields) or [*STATUS_FIELDS, "revision"]
+        downloads = [
+            {field: d[field] for field in requested}
+            for d in map(progress_registry.overlay, changes["downloads"])
+        ]
+        return DownloadChangesResponse(
+            success=True,
+            revision=changes["revision"],
+            reset=reset,
+            downloads=downloads,
+            deleted=changes["deleted"],
+            active=changes["active"],
+        )
+    except Exception as e:
+        return DownloadChangesResponse(success=False, error=str(e))
+
+
+@router.get("/summary", response_model=DownloadSummaryResponse)
+async def get_download_summary(start_date: str | None = None, end_date: str | None = None):
+    """Count downloads by status, by file type and by date"""
+    try:
+        summary = await db.aio.summarize_downloads(start_date, end_date)
+        return DownloadSummaryResponse(success=True, **summary)
+    except Exception as e:
+        return DownloadSummaryResponse(success=False, error=str(e))
+
+
 @router.get("/{download_id}")
 async def get_download(download_id: int):
     """Get a specific download by ID"""
-    download = db.get_download(download_id)
+    download = await db.aio.get_download(download_id)
     if not download:
         raise HTTPException(status_code=404, detail="Download not found")
+    download = progress_registry.overlay(download)
 
     return {
         "success": True,
@@ -157,6 +300,13 @@ async def get_download(download_id: int):
             "progress": download["progress"],
             "error_message": download["error_message"],
             "retry_count": download["retry_count"],
+            "bytes_downloaded": download["bytes_downloaded"],
+            "sha256": download["sha256"],
+            "size_bytes": download["size_bytes"],
+            "http_status": download["http_status"],
+            "content_type": download["content_type"],
+            "etag": download["etag"],
+            "last_modified": download["last_modified"],
             "created_at": download["created_at"],
             "updated_at": download["updated_at"],
             "completed_at": download["completed_at"],
@@ -0,0 +1,54 @@
+"""Background job API endpoints"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.services.database import db
+from app.services.job_service import job_queue
+
+router = APIRouter()
+
+
+class JobResponse(BaseModel):
+    success: bool
+    job: dict | None = None
+    error: str | None = None
+
+
+class JobListResponse(BaseModel):
+    success: bool
+    jobs: list[dict]
+    error: str | None = None
+
+
+@router.get("/", response_model=JobListResponse)
+async def list_jobs(status: str | None = None, limit: int = 100):
+    """List background jobs, newest first"""
+    try:
+        return JobListResponse(
+            success=True, jobs=await db.aio.list_jobs(status=status, limit=limit)
+        )
+    except Exception as e:
+        return JobListResponse(success=False, jobs=[], error=str(e))
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int):
+    """Get status and result of a background job"""
+    job = await db.aio.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(success=True, job=job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: int):
+    """Cancel a queued or running job"""
+    if not await db.aio.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not await job_queue.cancel(job_id):
+        return JobResponse(
+            success=False, job=await db.aio.get_job(job_id), error="Job has already finished"
+        )
+    return JobResponse(success=True, job=await db.aio.get_job(job_id))
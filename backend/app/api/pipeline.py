@@ -1,9 +1,13 @@
 """Pipeline API endpoints for full workflow"""
 
+import json
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.services.pipeline_service import PipelineService
+from app.services.verification_service import VerificationService
 
 router = APIRouter()
 
@@ -105,3 +109,22 @@ async def verify_only(start_date: str, end_date: str, raw_path: str):
         )
     except Exception as e:
         return {"success": False, "error": str(e)}
+
+
+@router.post("/verify-stream")
+async def verify_stream(start_date: str, end_date: str, raw_path: str):
+    """Verify downloads, streaming one JSON line per file as it is verified
+
+    The last line is the summary.
+    """
+
+    async def lines():
+        try:
+            async for event in VerificationService().stream_downloads(
+                start_date=start_date, end_date=end_date, raw_path=raw_path
+            ):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "summary", "success": False, "error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
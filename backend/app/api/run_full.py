@@ -3,8 +3,10 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+from app.services.database import db
 from app.services.download_service import DownloadService
 from app.services.parse_service import ParseService
+from app.services.trading_calendar import trading_calendar
 from app.services.utils import get_settings, log_message
 
 router = APIRouter()
@@ -41,11 +43,14 @@ async def run_full_automation():
         # Step 1: Download files
         log_message("Step 1: Downloading files...")
         download_service = DownloadService()
-        from datetime import datetime, timedelta, timezone
+        from datetime import datetime, timezone
 
+        # Fetch today plus the previous trading day (skipping weekends/holidays)
         today_dt = datetime.now(timezone.utc)
         today = today_dt.strftime("%Y-%m-%d")
-        yesterday = (today_dt - timedelta(days=1)).strftime("%Y-%m-%d")
+        yesterday = (
+            await db.aio.run(trading_calendar.previous_trading_day, today_dt.date())
+        ).isoformat()
 
         download_result = await download_service.download_files(
             start_date=yesterday,
@@ -7,6 +7,8 @@ from pathlib import Path
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+from app.services.rate_limiter import nse_rate_limiter, rate_limit_config
+
 router = APIRouter()
 
 SETTINGS_FILE = Path(__file__).parent.parent.parent / "settings.json"
@@ -26,6 +28,21 @@ class SettingsResponse(BaseModel):
     error: str | None = None
 
 
+class RateLimitRequest(BaseModel):
+    max_calls: int
+    time_window: float = 60.0
+    burst: int | None = None
+    max_calls_ceiling: int | None = None
+    adaptive: bool = True
+
+
+class RateLimitResponse(BaseModel):
+    success: bool
+    config: dict | None = None
+    buckets: dict | None = None
+    error: str | None = None
+
+
 class PathTestRequest(BaseModel):
     path: str
 
@@ -37,15 +54,25 @@ class PathTestResponse(BaseModel):
 
 @router.post("/save", response_model=SettingsResponse)
 async def save_settings(request: SettingsRequest):
-    """Save application settings to JSON file"""
+    """Save application settings to JSON file
+
+    Keys not managed by this form (such as HTTP pool tuning) are preserved.
+    """
     try:
-        settings_data = {
-            "raw_path": request.raw_path,
-            "processed_path": request.processed_path,
-            "output_path": request.output_path,
-            "scheduler": request.scheduler,
-            "custom_cron": request.custom_cron or "",
-        }
+        settings_data = {}
+        if SETTINGS_FILE.exists():
+            with open(SETTINGS_FILE) as f:
+                settings_data = json.load(f)
+
+        settings_data.update(
+            {
+                "raw_path": request.raw_path,
+                "processed_path": request.processed_path,
+                "output_path": request.output_path,
+                "scheduler": request.scheduler,
+                "custom_cron": request.custom_cron or "",
+            }
+        )
 
         with open(SETTINGS_FILE, "w") as f:
             json.dump(settings_data, f, indent=2)
@@ -68,6 +95,47 @@ async def get_settings():
         return SettingsResponse(success=False, error=str(e))
 
 
+@router.get("/rate-limit", response_model=RateLimitResponse)
+async def get_rate_limit():
+    """Get the NSE rate limit configuration and the live state of each bucket"""
+    return RateLimitResponse(
+        success=True, config=nse_rate_limiter.config, buckets=await nse_rate_limiter.astate()
+    )
+
+
+@router.post("/rate-limit", response_model=RateLimitResponse)
+async def save_rate_limit(request: RateLimitRequest):
+    """Change the NSE rate limit at runtime and persist it to settings.json"""
+    try:
+        if request.max_calls < 1 or request.time_window <= 0:
+            raise ValueError("max_calls and time_window must be positive")
+
+        settings_data = {}
+        if SETTINGS_FILE.exists():
+            with open(SETTINGS_FILE) as f:
+                settings_data = json.load(f)
+
+        settings_data.update(
+            {
+                "rate_limit_max_calls": request.max_calls,
+                "rate_limit_time_window": request.time_window,
+                "rate_limit_burst": request.burst,
+                "rate_limit_max_calls_ceiling": request.max_calls_ceiling,
+                "rate_limit_adaptive": request.adaptive,
+            }
+        )
+
+        with open(SETTINGS_FILE, "w") as f:
+            json.dump(settings_data, f, indent=2)
+
+        await nse_rate_limiter.aconfigure(**rate_limit_config(settings_data))
+        return RateLimitResponse(
+            success=True, config=nse_rate_limiter.config, buckets=await nse_rate_limiter.astate()
+        )
+    except Exception as e:
+        return RateLimitResponse(success=False, error=str(e))
+
+
 @router.post("/test-path", response_model=PathTestResponse)
 async def test_path(request: PathTestRequest):
     """Test if a folder path is accessible"""
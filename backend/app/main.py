@@ -1,12 +1,31 @@
 """FastAPI main application entry point"""
 
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import download, logs, parse, pipeline, run_full, settings
+from app.api import backfill, download, jobs, logs, parse, pipeline, run_full, settings
+from app.services.http_client import http_pool
+from app.services.job_service import job_queue
+from app.services.retention_service import retention_service
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Manage process-wide resources for the lifetime of the application"""
+    async with http_pool.lifespan():
+        await job_queue.start()
+        await retention_service.start()
+        try:
+            yield
+        finally:
+            await retention_service.stop()
+            await job_queue.stop()
+
 
-app = FastAPI(title="HomeStock API", version="1.0.0")
+app = FastAPI(title="HomeStock API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware to allow Electron frontend
 app.add_middleware(
@@ -19,6 +38,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(download.router, prefix="/download", tags=["download"])
+app.include_router(backfill.router, prefix="/backfill", tags=["backfill"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 app.include_router(parse.router, prefix="/parse", tags=["parse"])
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
 app.include_router(logs.router, prefix="/logs", tags=["logs"])
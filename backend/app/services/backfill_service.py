@@ -0,0 +1,163 @@
+"""Checkpointed backfill of historical NSE files over long date ranges"""
+
+import asyncio
+import time
+from datetime import date, timedelta
+
+from app.services.database import db
+from app.services.download_service import DownloadService
+from app.services.rate_limiter import Priority
+from app.services.trading_calendar import trading_calendar
+from app.services.utils import log_message
+
+# Calendar days handed to download_files at a time
+DEFAULT_CHUNK_DAYS = 30
+
+DIRECTIONS = ("newest_first", "oldest_first")
+
+
+def with_progress(backfill: dict) -> dict:
+    """Add completion percentage, throughput and ETA to a backfill record"""
+    done = backfill["days_done"]
+    total = backfill["days_total"]
+    elapsed = backfill["elapsed_seconds"]
+    days_per_second = done / elapsed if elapsed else None
+    remaining = max(0, total - done)
+
+    return {
+        **backfill,
+        "percent": round(100.0 * done / total, 1) if total else 100.0,
+        "days_per_second": days_per_second,
+        "files_per_second": backfill["files_downloaded"] / elapsed if elapsed else None,
+        "eta_seconds": remaining / days_per_second if days_per_second else None,
+    }
+
+
+class BackfillService:
+    """Downloads a long date range chunk by chunk, checkpointing after each
+
+    The range is split into chunks of ``chunk_days`` calendar days, each
+    fetched with DownloadService.download_files (and so through the shared
+    client and the backfill lane of ``nse_rate_limiter``). After every chunk
+    the cursor - the next date still to fetch - and the counters are written
+    to the ``backfills`` table, so an interrupted backfill continues where it
+    stopped.
+    """
+
+    def __init__(self, download_service: DownloadService | None = None):
+        self.download_service = download_service or DownloadService(priority=Priority.BACKFILL)
+        self.calendar = trading_calendar
+
+    async def create(
+        self,
+        start_date: str,
+        end_date: str,
+        *,
+        urls: dict[str, str],
+        raw_path: str,
+        direction: str = "newest_first",
+        chunk_days: int = DEFAULT_CHUNK_DAYS,
+    ) -> int:
+        """Record a new backfill and return its ID; run() executes it"""
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        if start > end:
+            raise ValueError("start_date must not be after end_date")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of: {', '.join(DIRECTIONS)}")
+        if chunk_days < 1:
+            raise ValueError("chunk_days must be at least 1")
+
+        return await db.aio.create_backfill(
+            start_date=start.isoformat(),
+            end_date=end.isoformat(),
+            direction=direction,
+            chunk_days=chunk_days,
+            urls=urls,
+            raw_path=raw_path,
+            cursor=(end if direction == "newest_first" else start).isoformat(),
+            days_total=await self._count_trading_days(start, end),
+        )
+
+    async def _count_trading_days(self, start: date, end: date) -> int:
+        return len(await db.aio.run(self.calendar.trading_days, start, end))
+
+    def _next_chunk(self, backfill: dict) -> tuple[date, date] | None:
+        """Date range of the next chunk to fetch, or None when the backfill is done"""
+        start = date.fromisoformat(backfill["start_date"])
+        end = date.fromisoformat(backfill["end_date"])
+        cursor = date.fromisoformat(backfill["cursor"])
+        span = timedelta(days=backfill["chunk_days"] - 1)
+
+        if backfill["direction"] == "oldest_first":
+            return (cursor, min(cursor + span, end)) if cursor <= end else None
+        return (max(cursor - span, start), cursor) if cursor >= start else None
+
+    async def run(self, backfill_id: int) -> dict:
+        """Fetch the remaining chunks of a backfill
+
+        Returns the backfill record with progress information. If the task is
+        cancelled while the backfill is running it is left ``paused`` and can
+        be resumed by calling run() again.
+        """
+        backfill = await db.aio.get_backfill(backfill_id)
+        if not backfill:
+            raise ValueError(f"Backfill not found: {backfill_id}")
+        if backfill["status"] == "completed":
+            return with_progress(backfill)
+
+        await db.aio.update_backfill(backfill_id, status="running", error_message=None)
+        log_message(f"Backfill {backfill_id} running from {backfill['cursor']}")
+        try:
+            while (chunk := self._next_chunk(backfill)) is not None:
+                await self._run_chunk(backfill, *chunk)
+        except asyncio.CancelledError:
+            current = await db.aio.get_backfill(backfill_id)
+            if current and current["status"] == "running":
+                await db.aio.update_backfill(backfill_id, status="paused")
+            raise
+        except Exception as e:
+            await db.aio.update_backfill(backfill_id, status="failed", error_message=str(e))
+            raise
+
+        await db.aio.update_backfill(backfill_id, status="completed")
+        log_message(f"Backfill {backfill_id} completed")
+        return with_progress(await db.aio.get_backfill(backfill_id))
+
+    async def _run_chunk(self, backfill: dict, chunk_start: date, chunk_end: date):
+        """Download one chunk and checkpoint the backfill"""
+        started = time.monotonic()
+        result = await self.download_service.download_files(
+            start_date=chunk_start.isoformat(),
+            end_date=chunk_end.isoformat(),
+            urls=backfill["urls"],
+            raw_path=backfill["raw_path"],
+        )
+
+        if backfill["direction"] == "oldest_first":
+            cursor = chunk_end + timedelta(days=1)
+        else:
+            cursor = chunk_start - timedelta(days=1)
+        checkpoint = {
+            "cursor": cursor.isoformat(),
+            "days_done": backfill["days_done"]
+            + await self._count_trading_days(chunk_start, chunk_end),
+            "files_downloaded": backfill["files_downloaded"] + len(result["downloaded"]),
+            "files_missing": backfill["files_missing"] + len(result["missing"]),
+            "elapsed_seconds": backfill["elapsed_seconds"] + time.monotonic() - started,
+        }
+        await db.aio.update_backfill(backfill["id"], **checkpoint)
+        backfill.update(checkpoint)
+
+        progress = with_progress(backfill)
+        eta = progress["eta_seconds"]
+        log_message(
+            f"Backfill {backfill['id']}: {chunk_start} to {chunk_end} done, "
+            f"{progress['percent']}% complete"
+            + (f", ETA {eta / 60:.0f} min" if eta is not None else "")
+        )
+
+
+async def run_backfill_job(params: dict) -> dict:
+    """Run (or resume) a backfill as a background job"""
+    return await BackfillService().run(params["backfill_id"])
@@ -1,14 +1,102 @@
 """SQLite database for download tracking and file metadata"""
 
+import asyncio
+import functools
+import json
 import sqlite3
-from contextlib import contextmanager
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from pathlib import Path
 
 DB_PATH = Path(__file__).parent.parent.parent / "data" / "homestock.db"
 
+# Milliseconds a connection waits for another writer before failing with "locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Prepared statements kept per connection
+CACHED_STATEMENTS = 256
+
+# PRAGMA auto_vacuum value for INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Dedicated thread that runs all database calls made from the event loop
+_db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="homestock-db")
+
+# Columns of a backfill that change while it runs
+BACKFILL_PROGRESS_FIELDS = (
+    "status",
+    "cursor",
+    "days_done",
+    "files_downloaded",
+    "files_missing",
+    "elapsed_seconds",
+    "job_id",
+    "error_message",
+)
+
+# Columns of the downloads table, which query_downloads may project to
+DOWNLOAD_COLUMNS = (
+    "id",
+    "file_name",
+    "file_type",
+    "url",
+    "date_str",
+    "file_path",
+    "status",
+    "progress",
+    "error_message",
+    "retry_count",
+    "bytes_downloaded",
+    "sha256",
+    "size_bytes",
+    "http_status",
+    "content_type",
+    "etag",
+    "last_modified",
+    "created_at",
+    "updated_at",
+    "completed_at",
+    "revision",
+)
+
+# Insert a pending download, or reset the row already tracking that file type on that day.
+# Progress counters are kept so an interrupted transfer can still resume.
+UPSERT_DOWNLOAD_SQL = """
+    INSERT INTO downloads (file_name, file_type, url, date_str, file_path, status)
+    VALUES (:file_name, :file_type, :url, :date_str, :file_path, 'pending')
+    ON CONFLICT (date_str, file_type) DO UPDATE SET
+        file_name = excluded.file_name,
+        url = excluded.url,
+        file_path = excluded.file_path,
+        status = 'pending',
+        progress = 0.0,
+        error_message = NULL,
+        completed_at = NULL,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Content and HTTP metadata captured while a file is streamed to disk
+DOWNLOAD_METADATA_FIELDS = (
+    "sha256",
+    "size_bytes",
+    "http_status",
+    "content_type",
+    "etag",
+    "last_modified",
+)
+
 
 class Database:
-    """SQLite database manager for download tracking"""
+    """SQLite database manager for download tracking
+
+    Each thread keeps one open connection in WAL mode, so status polling
+    never blocks writers and a query does not pay for opening the file,
+    reading the schema and preparing its statement every time.
+
+    Async code uses the awaitable view in ``db.aio`` instead of calling the
+    methods directly.
+    """
 
     def __init__(self, db_path: Path = None):
         if db_path is None:
@@ -18,6 +106,7 @@ class Database:
 
         # Ensure parent directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
         self._init_db()
 
     def _init_db(self):
@@ -25,6 +114,14 @@ class Database:
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
+            # Let incremental_vacuum() return the pages freed by retention
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                # Applies the mode to an existing file, once. If another process
+                # has the database open, it is tried again on the next start.
+                with suppress(sqlite3.OperationalError):
+                    cursor.execute("VACUUM")
+
             # Downloads table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS downloads (
@@ -38,54 +135,400 @@ class Database:
                     progress REAL DEFAULT 0.0,
                     error_message TEXT,
                     retry_count INTEGER DEFAULT 0,
+                    bytes_downloaded INTEGER DEFAULT 0,
+                    sha256 TEXT,
+                    size_bytes INTEGER,
+                    http_status INTEGER,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    revision INTEGER,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     completed_at TIMESTAMP
                 )
             """)
 
+            # Columns added after the original schema
+            self._ensure_columns(
+                cursor,
+                "downloads",
+                {
+                    "bytes_downloaded": "INTEGER DEFAULT 0",
+                    "sha256": "TEXT",
+                    "size_bytes": "INTEGER",
+                    "http_status": "INTEGER",
+                    "content_type": "TEXT",
+                    "etag": "TEXT",
+                    "last_modified": "TEXT",
+                    "revision": "INTEGER",
+                },
+            )
+
             # Create indexes
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_file_name ON downloads(file_name)
             """)
+            # Status filters and the summary read this index in date order
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_status_date
+                ON downloads(status, date_str DESC, file_type)
+            """)
+            cursor.execute("DROP INDEX IF EXISTS idx_status")
+
+            self._init_revisions(cursor)
+            # One row per file type and day, ordered like the date range queries
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_date_file_type'"
+            )
+            if cursor.fetchone() is None:
+                self._compact_downloads(cursor)
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_date_file_type
+                ON downloads(date_str DESC, file_type)
+            """)
+            cursor.execute("DROP INDEX IF EXISTS idx_date_str")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sha256 ON downloads(sha256)
+            """)
+
+            # Dates on which every NSE file was missing, used to learn holidays
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS calendar_misses (
+                    date_str TEXT PRIMARY KEY,
+                    miss_count INTEGER NOT NULL DEFAULT 0,
+                    is_holiday INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # HTTP cache validators per URL, used for conditional GETs
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_length INTEGER,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Last verification result per file, valid while size and mtime are unchanged
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS verification_cache (
+                    file_path TEXT PRIMARY KEY,
+                    size_bytes INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT,
+                    result TEXT NOT NULL,
+                    verified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Completed downloads moved out of the working set by retention
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS download_archive (
+                    date_str TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    file_name TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    sha256 TEXT,
+                    size_bytes INTEGER,
+                    completed_at TIMESTAMP,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (date_str, file_type)
+                ) WITHOUT ROWID
+            """)
+
+            # Negative cache of URLs NSE answered with 404
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS not_found_cache (
+                    url TEXT PRIMARY KEY,
+                    date_str TEXT NOT NULL,
+                    miss_count INTEGER DEFAULT 1,
+                    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Checkpointed historical backfills
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS backfills (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    direction TEXT NOT NULL,
+                    chunk_days INTEGER NOT NULL,
+                    urls TEXT NOT NULL,
+                    raw_path TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    cursor TEXT,
+                    days_total INTEGER DEFAULT 0,
+                    days_done INTEGER DEFAULT 0,
+                    files_downloaded INTEGER DEFAULT 0,
+                    files_missing INTEGER DEFAULT 0,
+                    elapsed_seconds REAL DEFAULT 0,
+                    job_id INTEGER,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Rate limiter token buckets shared by all HomeStock processes
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_status ON downloads(status)
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    rate REAL NOT NULL
+                )
             """)
+
+            # Background jobs (download ranges etc.), persisted across restarts
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_date_str ON downloads(date_str)
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    result TEXT,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)
             """)
 
             conn.commit()
 
+    def _ensure_columns(self, cursor: sqlite3.Cursor, table: str, columns: dict[str, str]):
+        """Add any of the given columns that an existing table is missing"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row["name"] for row in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def _init_revisions(self, cursor: sqlite3.Cursor):
+        """Set up the revision counter behind the downloads change feed
+
+        Every insert into or update of ``downloads`` stamps the row with the
+        next value of a single counter, and deletes leave a tombstone with
+        theirs, so clients can ask for everything after the revision they saw.
+        Retention prunes old tombstones; ``pruned_through`` is the newest
+        revision pruned, and clients behind it have to start over.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS download_revision (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                value INTEGER NOT NULL,
+                pruned_through INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS download_deletions (
+                id INTEGER NOT NULL,
+                revision INTEGER PRIMARY KEY,
+                deleted_at TIMESTAMP
+            )
+        """)
+        self._ensure_columns(
+            cursor, "download_revision", {"pruned_through": "INTEGER NOT NULL DEFAULT 0"}
+        )
+        self._ensure_columns(cursor, "download_deletions", {"deleted_at": "TIMESTAMP"})
+        cursor.execute(
+            "UPDATE download_deletions SET deleted_at = CURRENT_TIMESTAMP WHERE deleted_at IS NULL"
+        )
+
+        # Rows from before the change feed get their id as first revision
+        cursor.execute("UPDATE downloads SET revision = id WHERE revision IS NULL")
+        cursor.execute("""
+            INSERT OR IGNORE INTO download_revision (id, value)
+            SELECT 1, COALESCE(MAX(revision), 0) FROM downloads
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_revision ON downloads(revision)
+        """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS downloads_revision_insert
+            AFTER INSERT ON downloads
+            BEGIN
+                UPDATE download_revision SET value = value + 1;
+                UPDATE downloads SET revision = (SELECT value FROM download_revision)
+                WHERE id = NEW.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS downloads_revision_update
+            AFTER UPDATE ON downloads
+            WHEN NEW.revision IS OLD.revision
+            BEGIN
+                UPDATE download_revision SET value = value + 1;
+                UPDATE downloads SET revision = (SELECT value FROM download_revision)
+                WHERE id = NEW.id;
+            END
+        """)
+        # Recreated so databases from before tombstones were dated get deleted_at
+        cursor.execute("DROP TRIGGER IF EXISTS downloads_revision_delete")
+        cursor.execute("""
+            CREATE TRIGGER downloads_revision_delete
+            AFTER DELETE ON downloads
+            BEGIN
+                UPDATE download_revision SET value = value + 1;
+                INSERT INTO download_deletions (id, revision, deleted_at)
+                SELECT OLD.id, value, CURRENT_TIMESTAMP FROM download_revision;
+            END
+        """)
+
+    def _compact_downloads(self, cursor: sqlite3.Cursor):
+        """Delete duplicate rows for the same file type and day
+
+        Databases created before downloads were upserted kept a row per
+        attempt. The completed row is kept if there is one, else the newest.
+        """
+        cursor.execute("""
+            DELETE FROM downloads WHERE id NOT IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY date_str, file_type
+                        ORDER BY status = 'completed' DESC, id DESC
+                    ) AS position
+                    FROM downloads
+                )
+                WHERE position = 1
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent readers and frequent small writes"""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
     @contextmanager
     def _get_connection(self):
-        """Get database connection with context manager"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
+        """Get this thread's database connection, opening it on first use
+
+        Uncommitted changes are rolled back if the block raises.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
         try:
             yield conn
-        finally:
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
             conn.close()
+            self._local.conn = None
+
+    @functools.cached_property
+    def aio(self) -> "AsyncDatabase":
+        """Awaitable view of this database for use on the event loop"""
+        return AsyncDatabase(self)
 
     def create_download(
         self, file_name: str, file_type: str, url: str, date_str: str, file_path: str
     ) -> int:
-        """Create a new download record"""
+        """Create a pending download record, reusing the row for the same file type and day"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """
-                INSERT INTO downloads
-                (file_name, file_type, url, date_str, file_path, status)
-                VALUES (?, ?, ?, ?, ?, 'pending')
-            """,
-                (file_name, file_type, url, date_str, file_path),
+                UPSERT_DOWNLOAD_SQL + " RETURNING id",
+                {
+                    "file_name": file_name,
+                    "file_type": file_type,
+                    "url": url,
+                    "date_str": date_str,
+                    "file_path": file_path,
+                },
+            )
+            download_id = cursor.fetchone()[0]
+            conn.commit()
+            return download_id
+
+    def create_downloads_bulk(self, downloads: list[dict]) -> list[int]:
+        """Create many pending download records in a single transaction
+
+        Each dict has the create_download arguments; existing rows for the
+        same file type and day are reused as in create_download. Returns the
+        IDs in the same order.
+        """
+        if not downloads:
+            return []
+
+        dates = [d["date_str"] for d in downloads]
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(UPSERT_DOWNLOAD_SQL, downloads)
+            cursor.execute(
+                "SELECT id, date_str, file_type FROM downloads WHERE date_str BETWEEN ? AND ?",
+                (min(dates), max(dates)),
+            )
+            ids = {(row["date_str"], row["file_type"]): row["id"] for row in cursor.fetchall()}
+            conn.commit()
+            return [ids[(d["date_str"], d["file_type"])] for d in downloads]
+
+    def update_statuses_bulk(
+        self,
+        download_ids: list[int],
+        status: str,
+        error_message: str = None,
+        *,
+        only_statuses: tuple[str, ...] = (),
+    ):
+        """Set the same status on many downloads in a single transaction
+
+        With ``only_statuses``, downloads currently in another status are left alone.
+        """
+        if not download_ids:
+            return
+
+        sql = """
+            UPDATE downloads
+            SET status = ?,
+                error_message = COALESCE(?, error_message),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """
+        if only_statuses:
+            sql += f" AND status IN ({', '.join('?' * len(only_statuses))})"
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                sql,
+                [
+                    (status, error_message, download_id, *only_statuses)
+                    for download_id in download_ids
+                ],
             )
             conn.commit()
-            return cursor.lastrowid
 
     def update_download_status(
-        self, download_id: int, status: str, progress: float = None, error_message: str = None
+        self,
+        download_id: int,
+        status: str,
+        progress: float = None,
+        error_message: str = None,
+        bytes_downloaded: int = None,
     ):
         """Update download status and progress"""
         with self._get_connection() as conn:
@@ -97,6 +540,10 @@ class Database:
                 updates.append("progress = ?")
                 params.append(progress)
 
+            if bytes_downloaded is not None:
+                updates.append("bytes_downloaded = ?")
+                params.append(bytes_downloaded)
+
             if error_message is not None:
                 updates.append("error_message = ?")
                 params.append(error_message)
@@ -115,6 +562,37 @@ class Database:
             )
             conn.commit()
 
+    def update_download_metadata(self, download_id: int, **metadata):
+        """Store content hash, size and HTTP metadata of a download
+
+        Accepts any of DOWNLOAD_METADATA_FIELDS as keyword arguments.
+        """
+        unknown = set(metadata) - set(DOWNLOAD_METADATA_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown download metadata: {', '.join(sorted(unknown))}")
+        if not metadata:
+            return
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            updates = [f"{field} = ?" for field in metadata]
+            cursor.execute(
+                f"""
+                UPDATE downloads
+                SET {", ".join(updates)}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """,
+                [*metadata.values(), download_id],
+            )
+            conn.commit()
+
+    def get_downloads_by_hash(self, sha256: str) -> list[dict]:
+        """Get all downloads whose content has the given SHA-256"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM downloads WHERE sha256 = ? ORDER BY date_str", (sha256,))
+            return [dict(row) for row in cursor.fetchall()]
+
     def increment_retry(self, download_id: int):
         """Increment retry count"""
         with self._get_connection() as conn:
@@ -161,6 +639,342 @@ class Database:
             )
             return [dict(row) for row in cursor.fetchall()]
 
+    def query_downloads(
+        self,
+        *,
+        statuses: list[str] | None = None,
+        file_types: list[str] | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        after: tuple[str, str] | None = None,
+        limit: int = 500,
+        fields: list[str] | None = None,
+    ) -> list[dict]:
+        """Get one page of downloads matching all given filters
+
+        Rows are ordered newest date first, then by file type, which is the
+        order of the (date_str, file_type) key. ``after`` is the key of the
+        last row of the previous page; the next page starts right after it.
+        ``fields`` limits the columns returned (default all).
+        """
+        fields = list(fields or DOWNLOAD_COLUMNS)
+        unknown = set(fields) - set(DOWNLOAD_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown download fields: {', '.join(sorted(unknown))}")
+
+        conditions = []
+        params: list = []
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if file_types:
+            conditions.append(f"file_type IN ({', '.join('?' * len(file_types))})")
+            params.extend(file_types)
+        if start_date:
+            conditions.append("date_str >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date_str <= ?")
+            params.append(end_date)
+        if after:
+            conditions.append("(date_str < ? OR (date_str = ? AND file_type > ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT {", ".join(fields)} FROM downloads
+                {where}
+                ORDER BY date_str DESC, file_type
+                LIMIT ?
+            """,
+                [*params, limit],
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_downloads_by_ids(self, download_ids: list[int]) -> list[dict]:
+        """Get the downloads with the given IDs"""
+        if not download_ids:
+            return []
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT * FROM downloads WHERE id IN ({', '.join('?' * len(download_ids))})",
+                list(download_ids),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_download_changes(
+        self,
+        since: int,
+        *,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        limit: int = 500,
+    ) -> dict:
+        """Get downloads inserted, updated or deleted after revision ``since``
+
+        Returns dict with 'revision' (pass it as ``since`` next time),
+        'downloads' (changed rows in revision order), 'deleted' (IDs of
+        removed rows), 'active' (pending or downloading rows in the range) and
+        'stale' (deletions after ``since`` have been pruned, so the caller has
+        to start over from 0). All are read from one snapshot. At most ``limit`` rows are returned;
+        'revision' then stops at the last of them, so the next call picks up
+        the rest, and 'active' is None since it describes rows not returned yet.
+        """
+        range_conditions = []
+        range_params: list = []
+        if start_date:
+            range_conditions.append("date_str >= ?")
+            range_params.append(start_date)
+        if end_date:
+            range_conditions.append("date_str <= ?")
+            range_params.append(end_date)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # One read transaction, so the changes and the active count agree
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(
+                    f"""
+                    SELECT COUNT(*) FROM downloads
+                    WHERE {" AND ".join(["status IN ('pending', 'downloading')", *range_conditions])}
+                """,
+                    range_params,
+                )
+                active = cursor.fetchone()[0]
+
+                cursor.execute("SELECT value, pruned_through FROM download_revision")
+                row = cursor.fetchone()
+                revision = row["value"]
+                stale = 0 < since < row["pruned_through"]
+                if since >= revision:
+                    return {
+                        "revision": revision,
+                        "downloads": [],
+                        "deleted": [],
+                        "active": active,
+                        "stale": stale,
+                    }
+
+                cursor.execute(
+                    f"""
+                    SELECT * FROM downloads
+                    WHERE {" AND ".join(["revision > ?", *range_conditions])}
+                    ORDER BY revision
+                    LIMIT ?
+                """,
+                    [since, *range_params, limit],
+                )
+                downloads = [dict(row) for row in cursor.fetchall()]
+                if len(downloads) == limit:
+                    revision = downloads[-1]["revision"]
+                    active = None
+
+                cursor.execute(
+                    """
+                    SELECT id FROM download_deletions
+                    WHERE revision > ? AND revision <= ?
+                    ORDER BY revision
+                """,
+                    (since, revision),
+                )
+                deleted = [row["id"] for row in cursor.fetchall()]
+            finally:
+                conn.commit()
+            return {
+                "revision": revision,
+                "downloads": downloads,
+                "deleted": deleted,
+                "active": active,
+                "stale": stale,
+            }
+
+    def summarize_downloads(
+        self, start_date: str | None = None, end_date: str | None = None
+    ) -> dict:
+        """Count downloads by status, by file type and by date
+
+        Returns dict with 'total', 'by_status' ({status: count}) and
+        'by_file_type' / 'by_date' ({key: {status: count}}).
+        """
+        conditions = []
+        params = []
+        if start_date:
+            conditions.append("date_str >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date_str <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # One aggregate per group and status; no per-download rows leave SQLite
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT 'status' AS grp, NULL AS key, status, COUNT(*) AS count
+                    FROM downloads {where}
+                    GROUP BY status
+                    UNION ALL
+                    SELECT 'file_type', file_type, status, COUNT(*)
+                    FROM downloads {where}
+                    GROUP BY file_type, status
+                    UNION ALL
+                    SELECT 'date', date_str, status, COUNT(*)
+                    FROM downloads {where}
+                    GROUP BY date_str, status
+                )
+                ORDER BY grp, CASE WHEN grp = 'date' THEN key END DESC, key
+            """,
+                params * 3,
+            )
+            rows = cursor.fetchall()
+
+        summary = {"total": 0, "by_status": {}, "by_file_type": {}, "by_date": {}}
+        for row in rows:
+            status, count = row["status"], row["count"]
+            if row["grp"] == "status":
+                summary["total"] += count
+                summary["by_status"][status] = count
+            else:
+                group = "by_date" if row["grp"] == "date" else "by_file_type"
+                summary[group].setdefault(row["key"], {})[status] = count
+        return summary
+
+    def archive_downloads(self, before_date: str) -> int:
+        """Move completed downloads for dates before before_date to download_archive
+
+        Returns the number of downloads archived
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO download_archive
+                (date_str, file_type, file_name, url, file_path, sha256, size_bytes, completed_at)
+                SELECT date_str, file_type, file_name, url, file_path, sha256, size_bytes,
+                       completed_at
+                FROM downloads
+                WHERE status = 'completed' AND date_str < ?
+                ON CONFLICT (date_str, file_type) DO UPDATE SET
+                    file_name = excluded.file_name,
+                    url = excluded.url,
+                    file_path = excluded.file_path,
+                    sha256 = excluded.sha256,
+                    size_bytes = excluded.size_bytes,
+                    completed_at = excluded.completed_at,
+                    archived_at = CURRENT_TIMESTAMP
+            """,
+                (before_date,),
+            )
+            cursor.execute(
+                "DELETE FROM downloads WHERE status = 'completed' AND date_str < ?",
+                (before_date,),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def prune_failed_downloads(self, older_than_days: int) -> int:
+        """Delete failed downloads not touched for older_than_days days
+
+        Failed attempts at files that are already in the archive are
+        superseded and deleted regardless of age. Returns the number deleted.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                DELETE FROM downloads
+                WHERE status = 'failed'
+                AND (
+                    updated_at < datetime('now', ?)
+                    OR EXISTS (
+                        SELECT 1 FROM download_archive a
+                        WHERE a.date_str = downloads.date_str
+                        AND a.file_type = downloads.file_type
+                    )
+                )
+            """,
+                (f"-{older_than_days} days",),
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def prune_deletions(self, before_date: str) -> int:
+        """Delete change feed tombstones from before before_date
+
+        Clients that last polled before the newest pruned tombstone are told
+        to start over. Returns the number deleted.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE download_revision
+                SET pruned_through = MAX(pruned_through, COALESCE(
+                    (SELECT MAX(revision) FROM download_deletions WHERE deleted_at < ?), 0
+                ))
+            """,
+                (before_date,),
+            )
+            cursor.execute("DELETE FROM download_deletions WHERE deleted_at < ?", (before_date,))
+            conn.commit()
+            return cursor.rowcount
+
+    def get_verification_paths(self) -> list[str]:
+        """Get the paths of all files with a cached verification result"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT file_path FROM verification_cache")
+            return [row["file_path"] for row in cursor.fetchall()]
+
+    def prune_verification_cache(self, before_date: str, file_paths: list[str] = ()) -> int:
+        """Delete cached verification results from before before_date, and those of file_paths
+
+        Returns the number deleted.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM verification_cache WHERE verified_at < ?", (before_date,))
+            deleted = cursor.rowcount
+            cursor.executemany(
+                "DELETE FROM verification_cache WHERE file_path = ?",
+                [(file_path,) for file_path in file_paths],
+            )
+            conn.commit()
+            return deleted + max(cursor.rowcount, 0)
+
+    def get_archived_downloads(self, start_date: str, end_date: str) -> list[dict]:
+        """Get archived downloads in date range"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT * FROM download_archive
+                WHERE date_str BETWEEN ? AND ?
+                ORDER BY date_str DESC, file_type
+            """,
+                (start_date, end_date),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def incremental_vacuum(self) -> int:
+        """Return free pages to the filesystem
+
+        Returns the number of pages freed
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            free_pages = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            cursor.execute("PRAGMA incremental_vacuum").fetchall()
+            conn.commit()
+            return free_pages - cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
     def get_failed_downloads(self) -> list[dict]:
         """Get all failed downloads"""
         with self._get_connection() as conn:
@@ -189,6 +1003,351 @@ class Database:
             )
             conn.commit()
 
+    def record_calendar_miss(self, date_str: str) -> int:
+        """Record a run in which every file for a date was missing
+
+        Returns the number of such runs recorded for the date
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO calendar_misses (date_str, miss_count)
+                VALUES (?, 1)
+                ON CONFLICT(date_str) DO UPDATE
+                SET miss_count = miss_count + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (date_str,),
+            )
+            cursor.execute("SELECT miss_count FROM calendar_misses WHERE date_str = ?", (date_str,))
+            conn.commit()
+            return cursor.fetchone()["miss_count"]
+
+    def mark_holiday(self, date_str: str):
+        """Mark a date as a learned exchange holiday"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO calendar_misses (date_str, is_holiday)
+                VALUES (?, 1)
+                ON CONFLICT(date_str) DO UPDATE
+                SET is_holiday = 1,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (date_str,),
+            )
+            conn.commit()
+
+    def get_learned_holidays(self) -> set[str]:
+        """Get all dates learned as exchange holidays"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT date_str FROM calendar_misses WHERE is_holiday = 1")
+            return {row["date_str"] for row in cursor.fetchall()}
+
+    def get_http_validators(self, url: str) -> dict | None:
+        """Get the stored ETag/Last-Modified/Content-Length for a URL"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM http_validators WHERE url = ?", (url,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def save_http_validators(
+        self, url: str, etag: str = None, last_modified: str = None, content_length: int = None
+    ):
+        """Store the cache validators of a completed download"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO http_validators (url, etag, last_modified, content_length)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE
+                SET etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_length = excluded.content_length,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (url, etag, last_modified, content_length),
+            )
+            conn.commit()
+
+    def record_not_found(self, url: str, date_str: str):
+        """Remember that a URL was answered with 404"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO not_found_cache (url, date_str) VALUES (?, ?)
+                ON CONFLICT(url) DO UPDATE
+                SET miss_count = miss_count + 1,
+                    checked_at = CURRENT_TIMESTAMP
+            """,
+                (url, date_str),
+            )
+            conn.commit()
+
+    def get_not_found(self, url: str) -> dict | None:
+        """Get the negative cache entry for a URL"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM not_found_cache WHERE url = ?", (url,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def clear_not_found(self, url: str):
+        """Forget a URL's negative cache entry"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM not_found_cache WHERE url = ?", (url,))
+            conn.commit()
+
+    def get_verifications(self, file_paths: list[str]) -> dict[str, dict]:
+        """Get the cached verification results for the given files, keyed by path"""
+        if not file_paths:
+            return {}
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM verification_cache "
+                f"WHERE file_path IN ({', '.join('?' * len(file_paths))})",
+                list(file_paths),
+            )
+            entries = {}
+            for row in cursor.fetchall():
+                entry = dict(row)
+                entry["result"] = json.loads(entry["result"])
+                entries[entry["file_path"]] = entry
+            return entries
+
+    def save_verifications(self, entries: list[dict]):
+        """Store verification results
+
+        Each entry has 'file_path', 'size_bytes', 'mtime_ns', 'sha256' and 'result'
+        """
+        with self._get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO verification_cache (file_path, size_bytes, mtime_ns, sha256, result)
+                VALUES (:file_path, :size_bytes, :mtime_ns, :sha256, :result)
+                ON CONFLICT(file_path) DO UPDATE
+                SET size_bytes = excluded.size_bytes,
+                    mtime_ns = excluded.mtime_ns,
+                    sha256 = excluded.sha256,
+                    result = excluded.result,
+                    verified_at = CURRENT_TIMESTAMP
+            """,
+                [{**entry, "result": json.dumps(entry["result"])} for entry in entries],
+            )
+            conn.commit()
+
+    def _backfill_from_row(self, row: sqlite3.Row) -> dict:
+        """Convert a backfills row to a dict with its URLs decoded"""
+        backfill = dict(row)
+        backfill["urls"] = json.loads(backfill["urls"])
+        return backfill
+
+    def create_backfill(
+        self,
+        start_date: str,
+        end_date: str,
+        *,
+        direction: str,
+        chunk_days: int,
+        urls: dict,
+        raw_path: str,
+        cursor: str,
+        days_total: int,
+    ) -> int:
+        """Create a new pending backfill"""
+        with self._get_connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(
+                """
+                INSERT INTO backfills
+                    (start_date, end_date, direction, chunk_days, urls, raw_path, cursor, days_total)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    start_date,
+                    end_date,
+                    direction,
+                    chunk_days,
+                    json.dumps(urls),
+                    raw_path,
+                    cursor,
+                    days_total,
+                ),
+            )
+            conn.commit()
+            return db_cursor.lastrowid
+
+    def get_backfill(self, backfill_id: int) -> dict | None:
+        """Get backfill by ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM backfills WHERE id = ?", (backfill_id,))
+            row = cursor.fetchone()
+            return self._backfill_from_row(row) if row else None
+
+    def list_backfills(self, limit: int = 100) -> list[dict]:
+        """List backfills, newest first"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM backfills ORDER BY id DESC LIMIT ?", (limit,))
+            return [self._backfill_from_row(row) for row in cursor.fetchall()]
+
+    def update_backfill(self, backfill_id: int, **fields):
+        """Update a backfill's progress
+
+        Accepts any of BACKFILL_PROGRESS_FIELDS as keyword arguments.
+        """
+        unknown = set(fields) - set(BACKFILL_PROGRESS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown backfill fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            updates = [f"{field} = ?" for field in fields]
+            cursor.execute(
+                f"""
+                UPDATE backfills
+                SET {", ".join(updates)}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """,
+                [*fields.values(), backfill_id],
+            )
+            conn.commit()
+
+    def _job_from_row(self, row: sqlite3.Row) -> dict:
+        """Convert a jobs row to a dict with its JSON fields decoded"""
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create_job(self, kind: str, params: dict) -> int:
+        """Create a new queued job"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO jobs (kind, params, status) VALUES (?, ?, 'queued')",
+                (kind, json.dumps(params)),
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+    def get_job(self, job_id: int) -> dict | None:
+        """Get job by ID"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._job_from_row(row) if row else None
+
+    def list_jobs(self, status: str = None, limit: int = 100) -> list[dict]:
+        """List jobs, newest first, optionally filtered by status"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if status:
+                cursor.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                    (status, limit),
+                )
+            else:
+                cursor.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            return [self._job_from_row(row) for row in cursor.fetchall()]
+
+    def update_job_status(
+        self,
+        job_id: int,
+        status: str,
+        result: dict = None,
+        error_message: str = None,
+        *,
+        only_statuses: tuple[str, ...] = (),
+    ) -> bool:
+        """Update job status, recording start/finish times and the outcome
+
+        With ``only_statuses``, a job currently in another status is left alone.
+        Returns True if the job was updated.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            updates = ["status = ?", "updated_at = CURRENT_TIMESTAMP"]
+            params = [status]
+
+            if status == "running":
+                updates.append("started_at = CURRENT_TIMESTAMP")
+            elif status in ("completed", "failed", "cancelled"):
+                updates.append("finished_at = CURRENT_TIMESTAMP")
+
+            if result is not None:
+                updates.append("result = ?")
+                params.append(json.dumps(result))
+
+            if error_message is not None:
+                updates.append("error_message = ?")
+                params.append(error_message)
+
+            sql = f"UPDATE jobs SET {', '.join(updates)} WHERE id = ?"
+            params.append(job_id)
+            if only_statuses:
+                sql += f" AND status IN ({', '.join('?' * len(only_statuses))})"
+                params.extend(only_statuses)
+            cursor.execute(sql, params)
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def requeue_interrupted_jobs(self) -> list[int]:
+        """Put jobs left running by a previous process back in the queue
+
+        Returns IDs of all queued jobs in submission order
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE jobs
+                SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'running'
+            """)
+            cursor.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id")
+            conn.commit()
+            return [row["id"] for row in cursor.fetchall()]
+
+
+class AsyncDatabase:
+    """Awaitable view of a Database
+
+    Every public method of the wrapped database is available as a coroutine
+    that runs on the dedicated database thread, so a slow query or commit
+    never stalls the event loop. The thread keeps its own connection open
+    like any other.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+
+    async def run(self, func, /, *args, **kwargs):
+        """Run a callable on the database thread and return its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_db_thread, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self._database, name)
+
+        async def call(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        return call
+
 
 # Global database instance
 db = Database()
@@ -1,20 +1,128 @@
 """Download service for NSE files with rate limiting and progress tracking"""
 
-from collections.abc import Callable
-from datetime import date, timedelta
+import asyncio
+import hashlib
+import os
+import shutil
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import urlparse
+
+import httpx
+
+from app.services.database import DOWNLOAD_METADATA_FIELDS, db
+from app.services.http_client import http_pool
+from app.services.progress_registry import progress_registry
+from app.services.rate_limiter import Priority, nse_rate_limiter
+from app.services.retry_policy import (
+    CircuitOpenError,
+    circuit_breaker,
+    parse_retry_after,
+    retry_policy,
+)
+from app.services.trading_calendar import trading_calendar
+from app.services.utils import get_date_tuple, log_message
 
-import requests
+# Maximum number of files downloaded concurrently by download_files
+DEFAULT_MAX_CONCURRENCY = 4
 
-from app.services.database import db
-from app.services.rate_limiter import nse_rate_limiter
-from app.services.utils import get_date_tuple, log_message
+# Size of the chunks streamed from the response body to disk
+CHUNK_SIZE = 64 * 1024
+
+# How long a 404 is trusted, by the age in days of the file's date. NSE may
+# still publish files for recent dates; older dates are cached for good.
+NOT_FOUND_TTLS = (
+    (3, timedelta(hours=1)),
+    (30, timedelta(days=1)),
+    (90, timedelta(days=7)),
+)
+
+
+# Locks of the output paths being downloaded, with the number of tasks using each
+_path_locks: dict[Path, tuple[asyncio.Lock, int]] = {}
+
+
+@asynccontextmanager
+async def _exclusive_path(output_path: Path) -> AsyncIterator[None]:
+    """Hold the output path so that only one task at a time downloads to it
+
+    Downloads of the same file share its .part file and download record.
+    """
+    lock, users = _path_locks.get(output_path, (asyncio.Lock(), 0))
+    _path_locks[output_path] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _path_locks[output_path]
+        if users > 1:
+            _path_locks[output_path] = (lock, users - 1)
+        else:
+            del _path_locks[output_path]
+
+
+def _part_path(output_path: Path) -> Path:
+    """Path of the partial file a download is written to before completion"""
+    return output_path.with_name(output_path.name + ".part")
+
+
+def _hash_file(path: Path, hasher) -> int:
+    """Feed a file's contents to a hash object, returning the number of bytes read"""
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+            size += len(chunk)
+    return size
+
+
+def _write_chunk(f, hasher, chunk: bytes):
+    """Write a chunk to disk and add it to the running hash"""
+    f.write(chunk)
+    hasher.update(chunk)
+
+
+def _not_found_ttl(date_str: str) -> timedelta | None:
+    """How long a 404 for a file dated date_str stays valid (None means forever)"""
+    age = (datetime.now(timezone.utc).date() - date.fromisoformat(date_str)).days
+    for max_age, ttl in NOT_FOUND_TTLS:
+        if age <= max_age:
+            return ttl
+    return None
+
+
+def _link_or_copy(source: Path, target: Path):
+    """Hardlink target to source, copying instead when linking is not possible"""
+    if target.exists() or target.is_symlink():
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
 
 
 class DownloadService:
     """Service for downloading NSE data files with rate limiting"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        client: httpx.AsyncClient | None = None,
+        priority: Priority = Priority.SCHEDULED,
+    ):
+        """Initialize download service
+
+        Args:
+            max_concurrency: Maximum number of files downloaded at once
+            client: HTTP client to use instead of the shared ``http_pool`` client
+            priority: Rate limiter lane this service's requests wait in
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self._client = client
+        self.priority = priority
+        self.calendar = trading_calendar
         self.headers = {
             "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.11 (KHTML, like Gecko) Chrome/23.0.1271.64 Safari/537.11",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -77,59 +185,375 @@ class DownloadService:
 
         return urls
 
-    def _download_file_with_progress(
+    def _output_path(self, file_type: str, date_str: str, url: str, raw_path: str) -> Path:
+        """Local path a file type is saved to, with the extension taken from its URL"""
+        if url.endswith(".zip"):
+            ext = ".zip"
+        elif url.endswith(".DAT"):
+            ext = ".DAT"
+        else:
+            ext = ".csv"
+
+        raw_path_obj = Path(raw_path) if raw_path else Path.cwd() / "raw_data"
+        raw_path_obj.mkdir(parents=True, exist_ok=True)
+        return raw_path_obj / f"{file_type}_{date_str}{ext}"
+
+    async def _find_completed(self, output_file: Path, date_str: str) -> dict | None:
+        """Return the completed download record for a file that is already on disk
+
+        Archived downloads count as completed; their record has no ``id``.
+        """
+        if not output_file.exists():
+            return None
+        for d in await db.aio.get_downloads_by_date_range(date_str, date_str):
+            if d["file_name"] == output_file.name and d["status"] == "completed":
+                return d
+        for d in await db.aio.get_archived_downloads(date_str, date_str):
+            if d["file_name"] == output_file.name:
+                return {**d, "id": None}
+        return None
+
+    async def _known_missing(self, url: str, date_str: str) -> bool:
+        """Check the negative cache for a recent enough 404 for url"""
+        entry = await db.aio.get_not_found(url)
+        if not entry:
+            return False
+
+        ttl = _not_found_ttl(date_str)
+        if ttl is None:
+            return True
+        checked_at = datetime.fromisoformat(entry["checked_at"]).replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - checked_at < ttl
+
+    def _plan_fetches(self, date_urls: dict[str, str]) -> dict[str, list[str]]:
+        """Group file types by resolved URL so that each URL is fetched only once
+
+        Several NSE file types share a URL (``fo_participant_oi`` defaults to the
+        ``fo_udiff`` archive, ``cm_udiff`` and ``cm_bhavcopy`` are the same
+        bhavcopy zip). Returns dict mapping URL -> file types, the first of which
+        is downloaded while the others are materialised from it.
+        """
+        plan: dict[str, list[str]] = {}
+        for file_type, url in date_urls.items():
+            if url:
+                plan.setdefault(url, []).append(file_type)
+        return plan
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """HTTP client used for downloads, shared process-wide unless one was injected"""
+        return self._client or http_pool.get_client()
+
+    def _resume_offset(self, part_path: Path, download_id: int | None) -> int:
+        """Number of bytes of a partial download that can be resumed
+
+        The ``bytes_downloaded`` checkpoint in the downloads table is trusted
+        over the part file: anything written past the checkpoint is truncated,
+        so a resume always continues from bytes that were fully flushed.
+        """
+        if not part_path.exists():
+            return 0
+
+        size = part_path.stat().st_size
+        download = db.get_download(download_id) if download_id else None
+        recorded = (download or {}).get("bytes_downloaded") or 0
+        if 0 < recorded < size:
+            os.truncate(part_path, recorded)
+            size = recorded
+        return size
+
+    def _request_headers(
+        self, url: str, output_path: Path, offset: int, download_id: int | None = None
+    ) -> dict[str, str]:
+        """Build request headers for a download attempt
+
+        Resumed transfers ask for the remaining byte range, with ``If-Range`` set
+        to the validator recorded when the part file was started, so a file that
+        changed since is sent in full instead of being spliced onto stale bytes.
+        Fresh downloads of a file that is already on disk send the stored
+        ETag/Last-Modified validators, so an unchanged file costs a 304 instead
+        of a full body.
+        """
+        headers = dict(self.headers)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["Accept-Encoding"] = "identity"
+            download = db.get_download(download_id) if download_id else None
+            etag = (download or {}).get("etag")
+            # Weak ETags can't be used with If-Range
+            if etag and not etag.startswith("W/"):
+                headers["If-Range"] = etag
+            elif (download or {}).get("last_modified"):
+                headers["If-Range"] = download["last_modified"]
+            return headers
+
+        validators = db.get_http_validators(url) if output_path.exists() else None
+        if validators:
+            expected_size = validators.get("content_length")
+            if expected_size is None or expected_size == output_path.stat().st_size:
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    async def _write_response(
+        self,
+        response: httpx.Response,
+        part_path: Path,
+        offset: int,
+        download_id: int | None,
+        progress_callback: Callable | None,
+    ) -> str:
+        """Stream a response body into the part file, writing from a worker thread
+
+        When ``offset`` is non-zero the body is a ranged continuation and is
+        appended to the bytes already on disk. The SHA-256 of the complete file
+        is computed while streaming and returned as a hex digest.
+        """
+        content_length = int(response.headers.get("content-length", 0))
+        total_size = offset + content_length if content_length else 0
+        downloaded_size = offset
+
+        hasher = hashlib.sha256()
+        if offset:
+            await asyncio.to_thread(_hash_file, part_path, hasher)
+
+        f = await asyncio.to_thread(open, part_path, "ab" if offset else "wb")
+        try:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+                downloaded_size += len(chunk)
+
+                # Update progress
+                if total_size > 0:
+                    progress = (downloaded_size / total_size) * 100
+                else:
+                    progress = 50.0  # Unknown size, show 50%
+
+                # Live progress stays in memory, with occasional checkpoints
+                if download_id and progress_registry.update(download_id, progress, downloaded_size):
+                    await asyncio.to_thread(f.flush)
+                    await progress_registry.checkpoint(download_id)
+
+                if progress_callback:
+                    progress_callback(progress)
+        finally:
+            await asyncio.to_thread(f.close)
+
+        return hasher.hexdigest()
+
+    async def _download_file_with_progress(
         self,
         url: str,
         output_path: Path,
         download_id: int | None = None,
         progress_callback: Callable | None = None,
-    ) -> bool:
-        """Download a single file from URL with progress tracking and rate limiting"""
+    ) -> dict:
+        """Download a single file from URL with progress tracking and rate limiting
+
+        The response body is streamed over the shared keep-alive client and written
+        to disk from a worker thread, so the event loop stays free while a file
+        downloads.
+
+        Data is written to ``<name>.part`` and renamed into place atomically once
+        complete. If a part file from an earlier attempt exists, the transfer
+        resumes with an HTTP Range request; servers that ignore the range, or
+        whose file changed since, send a fresh download. Only one task at a time
+        downloads to a given output path; others wait for it. Files already on disk are revalidated with a conditional
+        GET, and a 304 answer counts as success.
+
+        Transient failures (timeouts, 429, 5xx) are retried automatically as
+        dictated by ``retry_policy``. While the host's circuit breaker is open,
+        requests wait for its trial request and fail fast if the trial fails.
+
+        Returns dict with 'success', 'status_code' (None if no response) and 'error'
+        """
+        async with _exclusive_path(output_path):
+            return await self._download_with_retries(
+                url, output_path, download_id, progress_callback
+            )
+
+    async def _download_with_retries(
+        self,
+        url: str,
+        output_path: Path,
+        download_id: int | None,
+        progress_callback: Callable | None,
+    ) -> dict:
+        """Download attempts for _download_file_with_progress, retried per retry_policy"""
+        part_path = _part_path(output_path)
+        host = urlparse(url).hostname or ""
+        attempt = 0
         try:
-            # Apply rate limiting
-            nse_rate_limiter.wait_if_needed()
+            while True:
+                openings = circuit_breaker.openings(host)
+                try:
+                    while (wait := circuit_breaker.seconds_until_allowed(host, openings)) > 0:
+                        await asyncio.sleep(wait)
+                except CircuitOpenError as e:
+                    log_message(f"Not downloading {url}: {e!s}")
+                    result = {"success": False, "status_code": None, "error": str(e)}
+                    break
+
+                attempt += 1
+                try:
+                    result = await self._attempt_download(
+                        url, output_path, download_id, progress_callback
+                    )
+                except BaseException:
+                    # Cancelled or crashed: don't leave other requests waiting on the trial
+                    circuit_breaker.release_trial(host)
+                    raise
+                if result["success"]:
+                    circuit_breaker.record_success(host)
+                    return result
+
+                status_code = result["status_code"]
+                retryable = retry_policy.is_retryable(status_code, result.pop("exception"))
+                if not retryable:
+                    circuit_breaker.record_success(host)  # The host answered, just not with data
+                    break
+                circuit_breaker.record_failure(host)
+                if attempt >= retry_policy.max_attempts:
+                    break
+
+                delay = retry_policy.delay(attempt, result.pop("retry_after"))
+                if delay is None:
+                    log_message(f"Not retrying {url}: server asked to wait too long")
+                    break
+                log_message(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 1})")
+                await asyncio.sleep(delay)
 
-            log_message(f"Downloading: {url}")
             if download_id:
-                db.update_download_status(download_id, "downloading", progress=0.0)
+                await db.aio.update_download_status(
+                    download_id,
+                    "failed",
+                    progress=0.0,
+                    error_message=result["error"],
+                    bytes_downloaded=part_path.stat().st_size if part_path.exists() else 0,
+                )
+            return {key: result[key] for key in ("success", "status_code", "error")}
+        finally:
+            if download_id:
+                progress_registry.finish(download_id)
 
-            response = requests.get(url, headers=self.headers, stream=True, timeout=30)
-            response.raise_for_status()
+    async def _attempt_download(
+        self,
+        url: str,
+        output_path: Path,
+        download_id: int | None,
+        progress_callback: Callable | None,
+    ) -> dict:
+        """Make a single download attempt
 
-            total_size = int(response.headers.get("content-length", 0))
-            downloaded_size = 0
+        Failures are returned rather than recorded, together with the exception
+        and any Retry-After delay, so the caller can decide whether to retry.
+        """
+        part_path = _part_path(output_path)
+        status_code = None
+        retry_after = None
+        try:
+            offset = await asyncio.to_thread(self._resume_offset, part_path, download_id)
 
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded_size += len(chunk)
+            # Apply rate limiting without blocking the event loop
+            await nse_rate_limiter.acquire(url, self.priority)
 
-                        # Update progress
-                        if total_size > 0:
-                            progress = (downloaded_size / total_size) * 100
-                        else:
-                            progress = 50.0  # Unknown size, show 50%
+            headers = await asyncio.to_thread(
+                self._request_headers, url, output_path, offset, download_id
+            )
+            if offset:
+                log_message(f"Resuming: {url} from byte {offset}")
+            else:
+                log_message(f"Downloading: {url}")
+            if download_id:
+                await progress_registry.start(download_id, offset)
+
+            async with self.client.stream("GET", url, headers=headers) as response:
+                status_code = response.status_code
+                await nse_rate_limiter.arecord_response(url, status_code)
+                if status_code == 304:
+                    return await self._not_modified(url, output_path, download_id)
+                if status_code == 416:
+                    # The part file no longer matches the remote file, start over next time
+                    await asyncio.to_thread(part_path.unlink, missing_ok=True)
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                response.raise_for_status()
+
+                if status_code != 206:
+                    offset = 0  # Range ignored or file changed, the full body follows
+                validators = {
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                }
+                if download_id:
+                    # Recorded before any bytes so a later resume can send If-Range
+                    await db.aio.update_download_metadata(download_id, **validators)
+                sha256 = await self._write_response(
+                    response, part_path, offset, download_id, progress_callback
+                )
 
-                        if download_id:
-                            db.update_download_status(download_id, "downloading", progress=progress)
+                content_type = response.headers.get("content-type")
 
-                        if progress_callback:
-                            progress_callback(progress)
+            await asyncio.to_thread(os.replace, part_path, output_path)
+            size = output_path.stat().st_size
+            await db.aio.save_http_validators(url, content_length=size, **validators)
 
             log_message(f"Downloaded: {output_path.name}")
             if download_id:
-                db.update_download_status(download_id, "completed", progress=100.0)
-            return True
+                await db.aio.update_download_status(
+                    download_id, "completed", progress=100.0, bytes_downloaded=size
+                )
+                await db.aio.update_download_metadata(
+                    download_id,
+                    sha256=sha256,
+                    size_bytes=size,
+                    http_status=status_code,
+                    content_type=content_type,
+                    **validators,
+                )
+                await self._report_duplicates(download_id, sha256)
+            return {"success": True, "status_code": status_code, "error": None}
 
-        except requests.exceptions.RequestException as e:
-            error_msg = str(e)
+        except (httpx.HTTPError, OSError) as e:
+            error_msg = str(e) or type(e).__name__
             log_message(f"Failed to download {url}: {error_msg}")
-            if download_id:
-                db.update_download_status(
-                    download_id, "failed", progress=0.0, error_message=error_msg
-                )
-            return False
+            return {
+                "success": False,
+                "status_code": status_code,
+                "error": error_msg,
+                "exception": e,
+                "retry_after": retry_after,
+            }
+
+    async def _not_modified(self, url: str, output_path: Path, download_id: int | None) -> dict:
+        """Handle a 304 answer: the file on disk is current and no body was transferred"""
+        # A revalidation is far cheaper than a download, so it does not use up a token
+        await nse_rate_limiter.arefund(url)
+
+        log_message(f"Not modified: {output_path.name}")
+        if download_id:
+            hasher = hashlib.sha256()
+            size = await asyncio.to_thread(_hash_file, output_path, hasher)
+            await db.aio.update_download_status(
+                download_id, "completed", progress=100.0, bytes_downloaded=size
+            )
+            await db.aio.update_download_metadata(
+                download_id, sha256=hasher.hexdigest(), size_bytes=size, http_status=304
+            )
+        return {"success": True, "status_code": 304, "error": None}
+
+    async def _report_duplicates(self, download_id: int, sha256: str):
+        """Log other downloads (different date or URL) whose content is identical"""
+        download = await db.aio.get_download(download_id)
+        duplicates = [
+            d
+            for d in await db.aio.get_downloads_by_hash(sha256)
+            if d["id"] != download_id and d["url"] != download["url"]
+        ]
+        if duplicates:
+            others = ", ".join(d["file_name"] for d in duplicates[:5])
+            log_message(f"{download['file_name']} has the same content as: {others}")
 
     async def download_single_file(
         self,
@@ -138,9 +562,18 @@ class DownloadService:
         url: str,
         raw_path: str,
         custom_urls: dict[str, str] = None,
+        *,
+        download_id: int | None = None,
     ) -> dict:
         """Download a single file with database tracking
 
+        URLs answered with 404 are kept in a negative cache and not requested
+        again until the entry expires (see NOT_FOUND_TTLS); such results have
+        'cached' set and no download_id.
+
+        ``download_id`` is a pending record created by the caller's planning;
+        without it the record is looked up or created here.
+
         Returns dict with download_id and status
         """
         # Generate URL if not provided
@@ -150,62 +583,225 @@ class DownloadService:
             if not url:
                 return {"success": False, "error": f"Unknown file type: {file_type}"}
 
-        # Determine file extension
-        if url.endswith(".zip"):
-            ext = ".zip"
-        elif url.endswith(".DAT"):
-            ext = ".DAT"
-        else:
-            ext = ".csv"
-
-        filename = f"{file_type}_{date_str}{ext}"
-        raw_path_obj = Path(raw_path) if raw_path else Path.cwd() / "raw_data"
-        raw_path_obj.mkdir(parents=True, exist_ok=True)
-        output_file = raw_path_obj / filename
-
-        # Check if already exists
-        if output_file.exists():
-            # Check if we have a completed record
-            downloads = db.get_downloads_by_date_range(date_str, date_str)
-            for d in downloads:
-                if d["file_name"] == filename and d["status"] == "completed":
-                    return {
-                        "success": True,
-                        "download_id": d["id"],
-                        "message": "File already exists",
-                        "file_path": str(output_file),
-                    }
-
-        # Create download record
-        download_id = db.create_download(
-            file_name=filename,
-            file_type=file_type,
-            url=url,
-            date_str=date_str,
-            file_path=str(output_file),
-        )
+        output_file = self._output_path(file_type, date_str, url, raw_path)
+
+        if download_id is None:
+            # Check if already exists with a completed record
+            existing = await self._find_completed(output_file, date_str)
+            if existing:
+                return {
+                    "success": True,
+                    "download_id": existing["id"],
+                    "message": "File already exists",
+                    "file_path": str(output_file),
+                }
+
+            # NSE said recently that this file does not exist, don't ask again yet
+            if await self._known_missing(url, date_str):
+                return {
+                    "success": False,
+                    "status_code": 404,
+                    "cached": True,
+                    "error": "File not published (cached 404)",
+                }
+
+            # Create download record
+            download_id = await db.aio.create_download(
+                file_name=output_file.name,
+                file_type=file_type,
+                url=url,
+                date_str=date_str,
+                file_path=str(output_file),
+            )
 
         # Download file
-        success = self._download_file_with_progress(url, output_file, download_id)
+        result = await self._download_file_with_progress(url, output_file, download_id)
+
+        if result["status_code"] == 404:
+            await db.aio.record_not_found(url, date_str)
+        elif result["success"]:
+            await db.aio.clear_not_found(url)
 
-        if success:
+        if result["success"]:
             return {
                 "success": True,
                 "download_id": download_id,
                 "file_path": str(output_file),
                 "message": "Download completed",
             }
-        return {"success": False, "download_id": download_id, "error": "Download failed"}
+        return {
+            "success": False,
+            "download_id": download_id,
+            "status_code": result["status_code"],
+            "error": "Download failed",
+        }
+
+    async def _materialise_alias(
+        self,
+        source: dict,
+        file_type: str,
+        date_str: str,
+        url: str,
+        raw_path: str,
+        *,
+        download_id: int | None = None,
+    ) -> dict:
+        """Create a file type's copy of a URL that was downloaded for another file type
+
+        The file is hardlinked to the downloaded one (falling back to a copy
+        across filesystems) and gets its own ``downloads`` row, which may be
+        passed in as ``download_id`` if it was created in advance.
+        """
+        output_file = self._output_path(file_type, date_str, url, raw_path)
+
+        if download_id is None:
+            existing = await self._find_completed(output_file, date_str)
+            if existing:
+                return {
+                    "success": True,
+                    "download_id": existing["id"],
+                    "message": "File already exists",
+                    "file_path": str(output_file),
+                }
+
+            download_id = await db.aio.create_download(
+                file_name=output_file.name,
+                file_type=file_type,
+                url=url,
+                date_str=date_str,
+                file_path=str(output_file),
+            )
+
+        if not source.get("success"):
+            await db.aio.update_download_status(
+                download_id, "failed", progress=0.0, error_message=f"Shared download failed: {url}"
+            )
+            return {"success": False, "download_id": download_id, "error": "Download failed"}
+
+        try:
+            await asyncio.to_thread(_link_or_copy, Path(source["file_path"]), output_file)
+        except OSError as e:
+            await db.aio.update_download_status(
+                download_id, "failed", progress=0.0, error_message=str(e)
+            )
+            return {"success": False, "download_id": download_id, "error": str(e)}
+
+        await db.aio.update_download_status(download_id, "completed", progress=100.0)
+
+        # The content is the same as the source, so is its metadata
+        source_download = await db.aio.get_download(source["download_id"])
+        if source_download:
+            await db.aio.update_download_metadata(
+                download_id,
+                **{field: source_download[field] for field in DOWNLOAD_METADATA_FIELDS},
+            )
+        return {
+            "success": True,
+            "download_id": download_id,
+            "file_path": str(output_file),
+            "message": "Shared download reused",
+        }
+
+    async def _download_url(
+        self,
+        file_types: list[str],
+        date_str: str,
+        url: str,
+        raw_path: str,
+        custom_urls: dict[str, str],
+        *,
+        planned_ids: dict[tuple[str, str], int] | None = None,
+    ) -> list[dict]:
+        """Download a URL once and materialise it for every file type that maps to it
+
+        ``planned_ids`` maps (file_type, date_str) to records created in advance.
+        """
+        planned_ids = planned_ids or {}
+        primary, *aliases = file_types
+        result = await self.download_single_file(
+            primary,
+            date_str,
+            url,
+            raw_path,
+            custom_urls,
+            download_id=planned_ids.get((primary, date_str)),
+        )
+
+        results = [result]
+        if result.get("cached"):
+            return results + [dict(result) for _ in aliases]
+        for file_type in aliases:
+            results.append(
+                await self._materialise_alias(
+                    result,
+                    file_type,
+                    date_str,
+                    url,
+                    raw_path,
+                    download_id=planned_ids.get((file_type, date_str)),
+                )
+            )
+        return results
+
+    async def _create_planned_records(
+        self,
+        planned: list[tuple[list[str], str, str]],
+        start_date: str,
+        end_date: str,
+        raw_path: str,
+    ) -> dict[tuple[str, str], int]:
+        """Create the pending records for a whole range in one transaction
+
+        Files already downloaded and URLs in the negative cache get no record.
+        Returns the new IDs keyed by (file_type, date_str).
+        """
+        completed = {
+            d["file_name"]
+            for d in await db.aio.get_downloads_by_date_range(start_date, end_date)
+            if d["status"] == "completed"
+        }
+        completed.update(
+            d["file_name"] for d in await db.aio.get_archived_downloads(start_date, end_date)
+        )
+
+        records = []
+        for file_types, date_str, url in planned:
+            if await self._known_missing(url, date_str):
+                continue
+            for file_type in file_types:
+                output_file = self._output_path(file_type, date_str, url, raw_path)
+                if output_file.name in completed and output_file.exists():
+                    continue
+                records.append(
+                    {
+                        "file_name": output_file.name,
+                        "file_type": file_type,
+                        "url": url,
+                        "date_str": date_str,
+                        "file_path": str(output_file),
+                    }
+                )
+
+        ids = await db.aio.create_downloads_bulk(records)
+        return {
+            (record["file_type"], record["date_str"]): download_id
+            for record, download_id in zip(records, ids, strict=True)
+        }
 
     async def download_files(
         self, start_date: str, end_date: str, urls: dict[str, str], raw_path: str
     ) -> dict[str, list[str]]:
         """Download files for date range (backward compatible)
         Returns dict with 'downloaded' and 'missing' lists
-        """
-        downloaded = []
-        missing = []
 
+        Weekends and exchange holidays are skipped using the trading calendar.
+        Each distinct URL per date becomes its own task; file types sharing a
+        URL are fetched once and hardlinked. At most ``max_concurrency`` tasks
+        run at once over the shared keep-alive client, so throughput is bounded
+        by the rate limiter rather than by serial round-trips. The pending
+        records for the whole range are created up front in one transaction;
+        if the run is cancelled, those not finished are marked failed.
+        """
         # Parse date range using date objects to avoid naive datetimes
         start = date.fromisoformat(start_date)
         end = date.fromisoformat(end_date)
@@ -214,44 +810,103 @@ class DownloadService:
         raw_path_obj = Path(raw_path) if raw_path else Path.cwd() / "raw_data"
         raw_path_obj.mkdir(parents=True, exist_ok=True)
 
-        # Iterate through dates
-        current_date = start
-        while current_date <= end:
-            date_str = current_date.isoformat()
+        # Build the fetch plan: one entry per distinct URL per trading day
+        planned = []
+        for day in await db.aio.run(self.calendar.trading_days, start, end):
+            date_str = day.isoformat()
             date_urls = self._generate_urls(date_str, urls)
+            planned.extend(
+                (file_types, date_str, url)
+                for url, file_types in self._plan_fetches(date_urls).items()
+            )
 
-            # Download each file type
-            for file_type, url in date_urls.items():
-                if not url:
-                    continue
+        planned_ids = await self._create_planned_records(planned, start_date, end_date, raw_path)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
-                result = await self.download_single_file(file_type, date_str, url, raw_path, urls)
+        async def fetch(file_types: list[str], date_str: str, url: str) -> list[dict]:
+            async with semaphore:
+                return await self._download_url(
+                    file_types, date_str, url, raw_path, urls, planned_ids=planned_ids
+                )
+
+        try:
+            results = await asyncio.gather(
+                *(fetch(file_types, date_str, url) for file_types, date_str, url in planned),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            # Don't leave unstarted or interrupted records pending for good. Status
+            # writes all go through the single database thread in order, so this
+            # runs after any the cancelled downloads had already submitted.
+            await db.aio.update_statuses_bulk(
+                list(planned_ids.values()),
+                "failed",
+                error_message="Cancelled",
+                only_statuses=("pending", "downloading"),
+            )
+            raise
+
+        downloaded = []
+        missing = []
+        not_found: dict[str, bool] = {}
+        for (file_types, date_str, url), group_results in zip(planned, results, strict=True):
+            if isinstance(group_results, BaseException):
+                log_message(f"Error downloading {url} for {date_str}: {group_results!s}")
+                missing.extend(f"{file_type}_{date_str} ({url})" for file_type in file_types)
+                await db.aio.update_statuses_bulk(
+                    [
+                        planned_ids[(file_type, date_str)]
+                        for file_type in file_types
+                        if (file_type, date_str) in planned_ids
+                    ],
+                    "failed",
+                    error_message=str(group_results),
+                )
+                not_found[date_str] = False
+                continue
+
+            for file_type, result in zip(file_types, group_results, strict=True):
                 if result.get("success"):
-                    downloaded.append(result.get("file_path", "").split("/")[-1])
+                    downloaded.append(Path(result.get("file_path", "")).name)
                 else:
                     missing.append(f"{file_type}_{date_str} ({url})")
 
-            current_date += timedelta(days=1)
+            primary = group_results[0]
+            if primary.get("cached") and _not_found_ttl(date_str) is not None:
+                continue  # Asked again when the entry expires, which counts then
+            # A 404 cached for good is as final as a fresh one, so it counts
+            # too, else old dates could never reach HOLIDAY_LEARN_THRESHOLD
+            not_found[date_str] = not_found.get(date_str, True) and (
+                primary.get("status_code") == 404
+            )
+
+        # Days on which NSE published nothing at all are candidate holidays
+        for date_str, all_missing in not_found.items():
+            if all_missing:
+                await db.aio.run(self.calendar.record_all_missing, date_str)
 
         return {"downloaded": downloaded, "missing": missing}
 
     async def retry_download(self, download_id: int) -> dict:
         """Retry a failed download"""
-        download = db.get_download(download_id)
+        download = await db.aio.get_download(download_id)
         if not download:
             return {"success": False, "error": "Download not found"}
 
         if download["status"] == "completed":
             return {"success": False, "error": "Download already completed"}
 
+        if download["retry_count"] >= retry_policy.max_manual_retries:
+            return {"success": False, "error": "Retry limit reached"}
+
         # Reset download status
-        db.reset_download(download_id)
-        db.increment_retry(download_id)
+        await db.aio.reset_download(download_id)
+        await db.aio.increment_retry(download_id)
 
         # Retry download
         output_file = Path(download["file_path"])
-        success = self._download_file_with_progress(download["url"], output_file, download_id)
+        result = await self._download_file_with_progress(download["url"], output_file, download_id)
 
-        if success:
+        if result["success"]:
             return {"success": True, "download_id": download_id, "message": "Retry successful"}
         return {"success": False, "download_id": download_id, "error": "Retry failed"}
@@ -0,0 +1,95 @@
+"""Shared HTTP connection pool for NSE requests"""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.services.utils import get_settings, log_message
+
+REQUEST_TIMEOUT = 30
+
+# Defaults for the connection pool, overridable through settings.json
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 5
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+
+def _http2_available() -> bool:
+    """Check whether the optional ``h2`` package needed for HTTP/2 is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpClientPool:
+    """Process-wide keep-alive HTTP client shared by all services
+
+    httpx connection pools are bound to the event loop that created them, so
+    one client is kept per running loop. In the API process that is a single
+    client: the app's lifespan registers its loop as ``home_loop`` and the
+    scheduler thread submits its work to that loop instead of starting its own.
+
+    Pool limits are read from settings.json (``http_max_connections``,
+    ``http_max_keepalive_connections``, ``http_keepalive_expiry``). Setting
+    ``http2`` to true enables HTTP/2 when the ``h2`` package is installed.
+    """
+
+    def __init__(self):
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.home_loop: asyncio.AbstractEventLoop | None = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create a client configured from the current settings"""
+        settings = get_settings()
+        limits = httpx.Limits(
+            max_connections=int(settings.get("http_max_connections", DEFAULT_MAX_CONNECTIONS)),
+            max_keepalive_connections=int(
+                settings.get("http_max_keepalive_connections", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)
+            ),
+            keepalive_expiry=float(settings.get("http_keepalive_expiry", DEFAULT_KEEPALIVE_EXPIRY)),
+        )
+
+        http2 = bool(settings.get("http2", False))
+        if http2 and not _http2_available():
+            log_message("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+
+        return httpx.AsyncClient(
+            limits=limits, http2=http2, timeout=REQUEST_TIMEOUT, follow_redirects=True
+        )
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Get the shared client for the running event loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._build_client()
+                self._clients[loop] = client
+            return client
+
+    async def aclose(self):
+        """Close the client bound to the running event loop, if any"""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def lifespan(self):
+        """Own the pool for the lifetime of the application's event loop"""
+        self.home_loop = asyncio.get_running_loop()
+        try:
+            yield self
+        finally:
+            self.home_loop = None
+            await self.aclose()
+
+
+# Global HTTP client pool
+http_pool = HttpClientPool()
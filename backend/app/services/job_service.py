@@ -0,0 +1,163 @@
+"""Background job queue executed by a fixed-size pool of asyncio workers"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from app.services.backfill_service import run_backfill_job
+from app.services.database import db
+from app.services.download_service import DownloadService
+from app.services.utils import get_settings, log_message
+
+DEFAULT_WORKERS = 2
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+
+class JobQueue:
+    """Persistent queue of background jobs
+
+    Jobs are stored in the ``jobs`` table when submitted, so submitting
+    returns a job ID immediately and queued or interrupted jobs are picked
+    up again after a restart. A fixed number of workers (``job_workers``
+    setting) execute them on the application's event loop.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers
+        self._handlers: dict[str, JobHandler] = {}
+        self._queue: asyncio.Queue[int] | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self._running: dict[int, asyncio.Task] = {}
+        self._cancelled: set[int] = set()
+
+    def register(self, kind: str, handler: JobHandler):
+        """Register the coroutine function that executes jobs of a kind"""
+        self._handlers[kind] = handler
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    async def start(self):
+        """Start the workers and re-queue jobs persisted by earlier runs"""
+        if self.started:
+            return
+
+        self._queue = asyncio.Queue()
+        for job_id in await db.aio.requeue_interrupted_jobs():
+            self._queue.put_nowait(job_id)
+
+        workers = self.workers or int(get_settings().get("job_workers", DEFAULT_WORKERS))
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(max(1, workers))
+        ]
+        log_message(f"Job queue started with {len(self._worker_tasks)} workers")
+
+    async def stop(self):
+        """Stop the workers; jobs still running are re-queued for the next start"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+    async def submit(self, kind: str, params: dict) -> int:
+        """Persist a new job and queue it for execution
+
+        Returns the job ID
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = await db.aio.create_job(kind, params)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    async def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job
+
+        Returns False if the job does not exist or has already finished
+        """
+        if await db.aio.update_job_status(job_id, "cancelled", only_statuses=("queued",)):
+            return True  # A worker can no longer claim it
+
+        job = await db.aio.get_job(job_id)
+        if not job or job["status"] != "running":
+            return False
+
+        # Claimed by a worker, which checks this set before starting the handler
+        self._cancelled.add(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await db.aio.update_job_status(job_id, "cancelled", only_statuses=("running",))
+
+    async def _worker(self):
+        """Take jobs off the queue and execute them one at a time"""
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: int):
+        """Run a single job and store its outcome"""
+        job = await db.aio.get_job(job_id)
+        if not job or job["status"] != "queued":
+            return  # Cancelled while waiting in the queue
+
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            await db.aio.update_job_status(
+                job_id, "failed", error_message=f"Unknown job kind: {job['kind']}"
+            )
+            return
+
+        # Claim the job atomically so a concurrent cancel either wins or sees it running
+        if not await db.aio.update_job_status(job_id, "running", only_statuses=("queued",)):
+            return  # Cancelled while the job was being read
+        if job_id in self._cancelled:
+            self._cancelled.discard(job_id)
+            return  # Cancelled right after the claim
+        log_message(f"Job {job_id} ({job['kind']}) started")
+
+        task = asyncio.create_task(handler(job["params"]))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                log_message(f"Job {job_id} cancelled")
+                return
+            # Shutting down: leave the job to be resumed on the next start
+            await db.aio.update_job_status(job_id, "queued")
+            raise
+        except Exception as e:
+            log_message(f"Job {job_id} failed: {e!s}")
+            await db.aio.update_job_status(job_id, "failed", error_message=str(e))
+        else:
+            await db.aio.update_job_status(job_id, "completed", result=result)
+            log_message(f"Job {job_id} completed")
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+
+async def run_download_job(params: dict) -> dict:
+    """Download NSE files for a date range"""
+    return await DownloadService().download_files(
+        start_date=params["start_date"],
+        end_date=params["end_date"],
+        urls=params.get("urls") or {},
+        raw_path=params.get("raw_path", ""),
+    )
+
+
+# Global job queue
+job_queue = JobQueue()
+job_queue.register("download", run_download_job)
+job_queue.register("backfill", run_backfill_job)
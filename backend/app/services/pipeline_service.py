@@ -96,7 +96,7 @@ class PipelineService:
             # Get file type from download record if available
             file_type = file_info.get("file_type", "")
             if not file_type and "download_id" in file_info:
-                download = db.get_download(file_info["download_id"])
+                download = await db.aio.get_download(file_info["download_id"])
                 if download:
                     file_type = download.get("file_type", "")
 
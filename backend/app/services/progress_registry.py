@@ -0,0 +1,116 @@
+"""In-memory registry of live download progress"""
+
+import threading
+import time
+
+from app.services.database import db
+
+# A checkpoint is written to SQLite when either threshold is crossed
+CHECKPOINT_INTERVAL = 5.0  # seconds since the last checkpoint
+CHECKPOINT_PROGRESS_STEP = 25.0  # percentage points since the last checkpoint
+
+
+class ProgressRegistry:
+    """Live progress of active downloads
+
+    Chunk-level progress is kept in memory and only checkpointed to the
+    downloads table at start, at completion and when a time or progress
+    threshold is crossed, instead of one SQLite transaction per chunk.
+    Readers such as ``/download/status`` overlay the live values on the
+    stored rows.
+    """
+
+    def __init__(
+        self,
+        checkpoint_interval: float = CHECKPOINT_INTERVAL,
+        checkpoint_step: float = CHECKPOINT_PROGRESS_STEP,
+    ):
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_step = checkpoint_step
+        self._entries: dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    async def start(self, download_id: int, bytes_downloaded: int = 0):
+        """Register an active download and record that it started
+
+        The write goes through the database thread, so it is ordered before
+        any status the caller stores afterwards, even if the caller is cancelled.
+        """
+        with self._lock:
+            self._entries[download_id] = {
+                "status": "downloading",
+                "progress": 0.0,
+                "bytes_downloaded": bytes_downloaded,
+                "checkpoint_at": time.monotonic(),
+                "checkpoint_progress": 0.0,
+            }
+        await db.aio.update_download_status(download_id, "downloading", progress=0.0)
+
+    def update(self, download_id: int, progress: float, bytes_downloaded: int) -> bool:
+        """Record live progress in memory
+
+        Returns True when a checkpoint is due; the caller should make the bytes
+        durable and then call ``checkpoint``.
+        """
+        with self._lock:
+            entry = self._entries.get(download_id)
+            if entry is None:
+                return False
+            entry["progress"] = progress
+            entry["bytes_downloaded"] = bytes_downloaded
+            return (
+                time.monotonic() - entry["checkpoint_at"] >= self.checkpoint_interval
+                or progress - entry["checkpoint_progress"] >= self.checkpoint_step
+            )
+
+    async def checkpoint(self, download_id: int):
+        """Write the current live progress of a download to the database"""
+        with self._lock:
+            entry = self._entries.get(download_id)
+            if entry is None:
+                return
+            entry["checkpoint_at"] = time.monotonic()
+            entry["checkpoint_progress"] = entry["progress"]
+            progress = entry["progress"]
+            bytes_downloaded = entry["bytes_downloaded"]
+
+        await db.aio.update_download_status(
+            download_id, "downloading", progress=progress, bytes_downloaded=bytes_downloaded
+        )
+
+    def finish(self, download_id: int):
+        """Stop tracking a download once its final state has been stored"""
+        with self._lock:
+            self._entries.pop(download_id, None)
+
+    def active_ids(self) -> list[int]:
+        """IDs of the downloads currently in progress"""
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, download_id: int) -> dict | None:
+        """Get live progress for an active download"""
+        with self._lock:
+            entry = self._entries.get(download_id)
+            if entry is None:
+                return None
+            return {
+                "status": entry["status"],
+                "progress": entry["progress"],
+                "bytes_downloaded": entry["bytes_downloaded"],
+            }
+
+    def overlay(self, download: dict) -> dict:
+        """Return a download record with its live progress applied
+
+        Only records still stored as pending/downloading are overlaid, so a
+        final status written to the database always wins.
+        """
+        if download["status"] not in ("pending", "downloading"):
+            return download
+        live = self.get(download["id"])
+        return {**download, **live} if live else download
+
+
+# Global progress registry
+progress_registry = ProgressRegistry()
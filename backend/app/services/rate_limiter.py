@@ -1,59 +1,490 @@
 """Rate limiter for NSE API calls"""
 
+import asyncio
+import itertools
+import sqlite3
+import threading
 import time
-from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from enum import IntEnum
+from pathlib import Path
 from threading import Lock
+from urllib.parse import urlparse
+
+from app.services.database import db
+from app.services.utils import get_settings, log_message
+
+# Defaults, overridable through settings.json / the settings API
+DEFAULT_MAX_CALLS = 5
+DEFAULT_TIME_WINDOW = 60.0
+
+# Consecutive successful calls after which an adaptive bucket speeds up again
+RAMP_UP_AFTER = 20
+RAMP_UP_FACTOR = 1.25
+
+# A throttled bucket halves its rate, but never drops below base rate / 10
+SLOW_DOWN_FACTOR = 0.5
+MIN_RATE_DIVISOR = 10
+
+# Status codes NSE uses to tell clients to back off
+THROTTLE_STATUS_CODES = frozenset({403, 429})
+
+# How long a process waits for another one holding the bucket table lock
+SHARED_BUSY_TIMEOUT = 10.0
+
+# Seconds a waiter must wait to be promoted by one priority level
+AGING_INTERVAL = 30.0
+
+
+class Priority(IntEnum):
+    """Rate limiter lanes; lower values are served first"""
+
+    INTERACTIVE = 0  # A user clicked download/retry and is watching
+    SCHEDULED = 1  # Daily scheduler runs and queued range downloads
+    BACKFILL = 2  # Long historical backfills
+
+
+class _Waiter:
+    """A caller queued for a token"""
+
+    _sequence = itertools.count()
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+        self.seq = next(self._sequence)
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.wake: Callable[[], None] = lambda: None
+
+    def rank(self, now: float) -> tuple[float, int]:
+        """Sort key: priority improved by one level per AGING_INTERVAL waited"""
+        return (self.priority - (now - self.enqueued_at) / AGING_INTERVAL, self.seq)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SharedBucketStore:
+    """Token bucket state kept in SQLite so every HomeStock process shares one budget
+
+    The app, the scheduler and CLI backfills each have their own limiter
+    objects; with a store they read and update the same ``rate_limit_buckets``
+    rows inside ``BEGIN IMMEDIATE`` transactions, which serialise access
+    across processes. Each thread keeps one open connection so an update
+    costs a single short write transaction.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                str(self.db_path), timeout=SHARED_BUSY_TIMEOUT, isolation_level=None
+            )
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[dict]:
+        """Lock a bucket across processes, yielding its state to read and update
+
+        The dict is empty for a bucket no process has used yet; its contents
+        are written back when the block exits without an error.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, rate FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            state = dict(row) if row else {}
+            yield state
+            conn.execute(
+                """
+                INSERT INTO rate_limit_buckets (key, tokens, updated_at, rate)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE
+                SET tokens = excluded.tokens,
+                    updated_at = excluded.updated_at,
+                    rate = excluded.rate
+            """,
+                (key, state["tokens"], state["updated_at"], state["rate"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
 
 
 class RateLimiter:
-    """Rate limiter to prevent overwhelming NSE servers
+    """Token bucket rate limiter to prevent overwhelming NSE servers
+
+    Tokens refill at ``max_calls / time_window`` per second up to ``burst``.
+    Callers without a token wait in a queue ordered by Priority lane and
+    arrival; each token goes to the best-ranked waiter at the moment it is
+    refilled, so an interactive request jumps ahead of queued backfill work.
+    Waiting raises a waiter's rank over time, so low lanes are not starved.
+    Only the waiter next in line sleeps with a timeout, the others sleep
+    until woken, so there is no polling. Async code awaits acquire(), threads
+    call wait_if_needed(); both draw from the same bucket and queue.
+
+    With ``adaptive`` set, throttling answers halve the rate and a run of
+    successes ramps it back up towards ``max_calls_ceiling / time_window``.
 
-    Implements token bucket algorithm
+    Given a ``store``, the fill level and rate live there under ``key`` and
+    are shared with every other process using the same store.
     """
 
-    def __init__(self, max_calls: int = 5, time_window: int = 60):
+    def __init__(
+        self,
+        max_calls: int = DEFAULT_MAX_CALLS,
+        time_window: float = DEFAULT_TIME_WINDOW,
+        burst: int | None = None,
+        max_calls_ceiling: int | None = None,
+        adaptive: bool = True,
+        *,
+        store: SharedBucketStore | None = None,
+        key: str = "default",
+    ):
         """Initialize rate limiter
 
         Args:
-            max_calls: Maximum number of calls allowed
+            max_calls: Calls allowed per time window on average
             time_window: Time window in seconds
+            burst: Calls allowed back to back after an idle period (default max_calls)
+            max_calls_ceiling: Highest max_calls adaptive ramp-up may reach (default max_calls)
+            adaptive: Slow down on 429/403 and speed up again after successes
+            store: Shared store holding the bucket state across processes
+            key: Name of the bucket in the store
         """
-        self.max_calls = max_calls
-        self.time_window = time_window
-        self.calls = deque()
         self.lock = Lock()
+        self.store = store
+        self.key = key
+        self._waiters: list[_Waiter] = []
+        self.tokens = float(burst or max_calls)
+        self.updated_at = time.time()
+        # Keep the rate other processes have adapted the shared bucket to
+        self._configure(max_calls, time_window, burst, max_calls_ceiling, adaptive, reset=False)
+
+    @contextmanager
+    def _bucket(self) -> Iterator[bool]:
+        """Lock the bucket state, loading it from and saving it to the store if any
+
+        Yields whether state was loaded from the store.
+        """
+        with self.lock:
+            if self.store is None:
+                yield False
+                return
+            with self.store.locked(self.key) as state:
+                if state:
+                    self.tokens = state["tokens"]
+                    self.updated_at = state["updated_at"]
+                    self.rate = state["rate"]
+                yield bool(state)
+                state.update(tokens=self.tokens, updated_at=self.updated_at, rate=self.rate)
+
+    def configure(
+        self,
+        max_calls: int = DEFAULT_MAX_CALLS,
+        time_window: float = DEFAULT_TIME_WINDOW,
+        burst: int | None = None,
+        max_calls_ceiling: int | None = None,
+        adaptive: bool = True,
+    ):
+        """Change the limits; takes effect for the next reservation"""
+        self._configure(max_calls, time_window, burst, max_calls_ceiling, adaptive, reset=True)
+
+    def _configure(
+        self,
+        max_calls: int,
+        time_window: float,
+        burst: int | None,
+        max_calls_ceiling: int | None,
+        adaptive: bool,
+        *,
+        reset: bool,
+    ):
+        """Apply limits; without ``reset`` a rate already in the store is kept"""
+        with self._bucket() as stored:
+            self.max_calls = max_calls
+            self.time_window = time_window
+            self.burst = max(1, burst or max_calls)
+            self.adaptive = adaptive
+            self.base_rate = max_calls / time_window
+            self.max_rate = max(self.base_rate, (max_calls_ceiling or max_calls) / time_window)
+            self.min_rate = self.base_rate / MIN_RATE_DIVISOR
+            if reset or not stored:
+                self.rate = self.base_rate
+            else:
+                self.rate = min(self.max_rate, max(self.min_rate, self.rate))
+            self._successes = 0
+            self.tokens = min(self.tokens, float(self.burst))
+
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last update (lock must be held)"""
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _dispatch(self, caller: _Waiter | None = None) -> float | None:
+        """Hand out available tokens to the best-ranked waiters
+
+        Returns how long ``caller`` should sleep before trying again: until
+        the next token if it is next in line, else None (until woken).
+        """
+        with self._bucket():
+            self._refill(time.time())
+            while self._waiters and self.tokens >= 1:
+                now = time.monotonic()
+                waiter = min(self._waiters, key=lambda w: w.rank(now))
+                self._waiters.remove(waiter)
+                self.tokens -= 1
+                waiter.granted = True
+                waiter.wake()
+
+            if not self._waiters:
+                return None
+            now = time.monotonic()
+            head = min(self._waiters, key=lambda w: w.rank(now))
+            if head is not caller:
+                head.wake()  # Make sure someone is timing the next token
+                return None
+            return (1 - self.tokens) / self.rate
+
+    def _withdraw(self, waiter: _Waiter):
+        """Remove a waiter that gave up, returning its token if it got one"""
+        with self.lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                granted = False
+            else:
+                granted = waiter.granted
+        if granted:
+            self.refund()
+        else:
+            self._dispatch()
 
-    def wait_if_needed(self):
-        """Wait if rate limit would be exceeded"""
+    def _enqueue(self, waiter: _Waiter):
         with self.lock:
-            now = time.time()
+            self._waiters.append(waiter)
+
+    def wait_if_needed(self, priority: Priority = Priority.SCHEDULED):
+        """Block the calling thread until a token is available"""
+        waiter = _Waiter(priority)
+        event = threading.Event()
+        waiter.wake = event.set
+        self._enqueue(waiter)
+
+        while True:
+            timeout = self._dispatch(waiter)
+            if waiter.granted:
+                return
+            event.wait(timeout)
+            event.clear()
 
-            # Remove old calls outside the time window
-            while self.calls and self.calls[0] < now - self.time_window:
-                self.calls.popleft()
+    async def acquire(self, priority: Priority = Priority.SCHEDULED):
+        """Wait without blocking the event loop until a token is available
+
+        If the waiting task is cancelled, its place or token is given back.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority)
+        try:
+            # With a store, a worker thread may hold the lock while it waits
+            # for another process's transaction, so only take it off the loop
+            if self.store:
+                await asyncio.to_thread(self._enqueue, waiter)
+            else:
+                self._enqueue(waiter)
+            while True:
+                future = loop.create_future()
+                waiter.wake = lambda f=future: loop.call_soon_threadsafe(_resolve, f)
+                # A shared store may have to wait for another process's transaction
+                if self.store:
+                    timeout = await asyncio.to_thread(self._dispatch, waiter)
+                else:
+                    timeout = self._dispatch(waiter)
+                if waiter.granted:
+                    return
+                await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            if self.store:
+                await asyncio.to_thread(self._withdraw, waiter)
+            else:
+                self._withdraw(waiter)
+            raise
 
-            # If we've hit the limit, wait
-            if len(self.calls) >= self.max_calls:
-                sleep_time = self.time_window - (now - self.calls[0])
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                    # Clean up again after sleep
-                    now = time.time()
-                    while self.calls and self.calls[0] < now - self.time_window:
-                        self.calls.popleft()
+    def refund(self):
+        """Give back a token
 
-            # Record this call
-            self.calls.append(time.time())
+        Used for requests that turned out to be nearly free for the server,
+        such as conditional GETs answered with 304 Not Modified.
+        """
+        with self._bucket():
+            self.tokens = min(float(self.burst), self.tokens + 1)
+        self._dispatch()
 
     def can_proceed(self) -> bool:
         """Check if we can make a call without waiting"""
+        with self._bucket():
+            self._refill(time.time())
+            return self.tokens >= 1
+
+    def record_response(self, status_code: int):
+        """Adapt the rate to how the server answered a call"""
+        if not self.adaptive:
+            return
+        with self._bucket():
+            if status_code in THROTTLE_STATUS_CODES:
+                self.rate = max(self.min_rate, self.rate * SLOW_DOWN_FACTOR)
+                self.tokens = min(self.tokens, 0.0)
+                self._successes = 0
+                log_message(
+                    f"NSE throttled (HTTP {status_code}), rate now {self.rate * 60:.2f}/min"
+                )
+            elif status_code < 500:
+                self._successes += 1
+                if self._successes >= RAMP_UP_AFTER and self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate * RAMP_UP_FACTOR)
+                    self._successes = 0
+
+    def state(self) -> dict:
+        """Current limits and fill level"""
+        with self._bucket():
+            self._refill(time.time())
+            return {
+                "max_calls": self.max_calls,
+                "time_window": self.time_window,
+                "burst": self.burst,
+                "adaptive": self.adaptive,
+                "calls_per_minute": self.rate * 60,
+                "tokens": self.tokens,
+            }
+
+
+def bucket_key(url: str) -> str:
+    """Bucket a URL belongs to: its host and first path segment
+
+    NSE serves archives and content/historical files from different
+    backends, so each gets its own budget.
+    """
+    parsed = urlparse(url)
+    segment = parsed.path.strip("/").split("/", 1)[0]
+    return f"{parsed.hostname or ''}/{segment}"
+
+
+class HostRateLimiter:
+    """Token buckets per host and path prefix, sharing one configuration
+
+    With a ``store`` every bucket is shared with other processes.
+    """
+
+    def __init__(self, store: SharedBucketStore | None = None, **config):
+        self.store = store
+        self.config = config
+        self.buckets: dict[str, RateLimiter] = {}
+        self.lock = Lock()
+
+    def bucket(self, url: str) -> RateLimiter:
+        """Get (creating if needed) the bucket for a URL
+
+        Creating a bucket reads the store, so it happens outside ``self.lock``.
+        """
+        key = bucket_key(url)
+        with self.lock:
+            limiter = self.buckets.get(key)
+        if limiter is None:
+            limiter = RateLimiter(**self.config, store=self.store, key=key)
+            with self.lock:
+                limiter = self.buckets.setdefault(key, limiter)
+        return limiter
+
+    async def _abucket(self, url: str) -> RateLimiter:
+        """Get the bucket for a URL, creating it in a worker thread if needed"""
+        with self.lock:
+            limiter = self.buckets.get(bucket_key(url))
+        if limiter is None and self.store:
+            return await asyncio.to_thread(self.bucket, url)
+        return limiter or self.bucket(url)
+
+    def configure(self, **config):
+        """Apply new limits to all current and future buckets"""
+        with self.lock:
+            self.config = config
+            buckets = list(self.buckets.values())
+        for limiter in buckets:
+            limiter.configure(**config)
+
+    def wait_if_needed(self, url: str, priority: Priority = Priority.SCHEDULED):
+        """Block the calling thread until the URL's bucket has a token"""
+        self.bucket(url).wait_if_needed(priority)
+
+    async def acquire(self, url: str, priority: Priority = Priority.SCHEDULED):
+        """Wait without blocking the event loop until the URL's bucket has a token"""
+        limiter = await self._abucket(url)
+        await limiter.acquire(priority)
+
+    def refund(self, url: str):
+        """Give a token back to the URL's bucket"""
+        self.bucket(url).refund()
+
+    def record_response(self, url: str, status_code: int):
+        """Adapt the URL's bucket to how the server answered"""
+        self.bucket(url).record_response(status_code)
+
+    def state(self) -> dict:
+        """Limits and fill level of every bucket"""
         with self.lock:
-            now = time.time()
-            # Remove old calls
-            while self.calls and self.calls[0] < now - self.time_window:
-                self.calls.popleft()
-            return len(self.calls) < self.max_calls
+            buckets = dict(self.buckets)
+        return {key: limiter.state() for key, limiter in buckets.items()}
+
+    # Awaitable versions for async code: with a store, each of these runs a
+    # write transaction that may wait on another process, so they run in a
+    # worker thread like acquire() does.
+
+    async def arefund(self, url: str):
+        """Give a token back to the URL's bucket without blocking the event loop"""
+        await asyncio.to_thread(self.refund, url)
+
+    async def arecord_response(self, url: str, status_code: int):
+        """Adapt the URL's bucket without blocking the event loop"""
+        await asyncio.to_thread(self.record_response, url, status_code)
+
+    async def aconfigure(self, **config):
+        """Apply new limits without blocking the event loop"""
+        await asyncio.to_thread(self.configure, **config)
+
+    async def astate(self) -> dict:
+        """Limits and fill level of every bucket, read without blocking the event loop"""
+        return await asyncio.to_thread(self.state)
+
+
+def rate_limit_config(settings: dict) -> dict:
+    """Rate limiter keyword arguments from settings.json keys"""
+    return {
+        "max_calls": int(settings.get("rate_limit_max_calls", DEFAULT_MAX_CALLS)),
+        "time_window": float(settings.get("rate_limit_time_window", DEFAULT_TIME_WINDOW)),
+        "burst": settings.get("rate_limit_burst"),
+        "max_calls_ceiling": settings.get("rate_limit_max_calls_ceiling"),
+        "adaptive": bool(settings.get("rate_limit_adaptive", True)),
+    }
+
+
+def _shared_store(settings: dict) -> SharedBucketStore | None:
+    """Store for the global limiter; set rate_limit_shared to false for a per-process budget"""
+    if not settings.get("rate_limit_shared", True):
+        return None
+    return SharedBucketStore(db.db_path)
 
 
-# Global rate limiter instance (5 calls per 60 seconds)
-nse_rate_limiter = RateLimiter(max_calls=5, time_window=60)
+# Global rate limiter for NSE (5 calls per 60 seconds per bucket unless configured)
+nse_rate_limiter = HostRateLimiter(
+    store=_shared_store(get_settings()), **rate_limit_config(get_settings())
+)
@@ -0,0 +1,89 @@
+"""Retention of the downloads table: archival, pruning and incremental vacuum"""
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from app.services.database import db
+from app.services.utils import get_settings, log_message
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+DEFAULT_PRUNE_FAILED_AFTER_DAYS = 30
+DEFAULT_INTERVAL_HOURS = 24.0
+
+# Seconds after startup before the first run, so it does not compete with startup work
+START_DELAY = 300.0
+
+
+class RetentionService:
+    """Keeps the downloads table down to the working set
+
+    Completed downloads for dates older than ``retention_archive_after_days``
+    move to ``download_archive``, one compact row per date and file type.
+    Failed attempts are pruned after ``retention_prune_failed_after_days``.
+    Change feed tombstones and cached verification results older than the
+    archive cutoff, or for files no longer on disk, are dropped too, and the
+    freed pages are returned with an incremental vacuum. Runs every
+    ``retention_interval_hours`` on the application's event loop.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    def run_once(self, today: date | None = None) -> dict:
+        """Archive, prune and vacuum once
+
+        Returns dict with the number of rows 'archived' and 'pruned', of
+        change feed tombstones and cached verifications pruned
+        ('pruned_deletions', 'pruned_verifications') and of 'freed_pages'
+        """
+        settings = get_settings()
+        archive_after = int(
+            settings.get("retention_archive_after_days", DEFAULT_ARCHIVE_AFTER_DAYS)
+        )
+        prune_after = int(
+            settings.get("retention_prune_failed_after_days", DEFAULT_PRUNE_FAILED_AFTER_DAYS)
+        )
+        cutoff = (today or datetime.now(timezone.utc).date()) - timedelta(days=archive_after)
+
+        missing_files = [p for p in db.get_verification_paths() if not Path(p).exists()]
+        result = {
+            "archived": db.archive_downloads(cutoff.isoformat()),
+            "pruned": db.prune_failed_downloads(prune_after),
+            "pruned_deletions": db.prune_deletions(cutoff.isoformat()),
+            "pruned_verifications": db.prune_verification_cache(cutoff.isoformat(), missing_files),
+        }
+        result["freed_pages"] = db.incremental_vacuum()
+        log_message(
+            f"Retention: archived {result['archived']} downloads before {cutoff}, "
+            f"pruned {result['pruned']} failed, {result['pruned_deletions']} tombstones and "
+            f"{result['pruned_verifications']} cached verifications, "
+            f"freed {result['freed_pages']} pages"
+        )
+        return result
+
+    async def start(self):
+        """Start running retention periodically"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_periodically(), name="retention")
+
+    async def stop(self):
+        """Stop the periodic runs"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_periodically(self):
+        await asyncio.sleep(START_DELAY)
+        while True:
+            try:
+                await db.aio.run(self.run_once)
+            except Exception as e:
+                log_message(f"Retention failed: {e!s}")
+            hours = float(get_settings().get("retention_interval_hours", DEFAULT_INTERVAL_HOURS))
+            await asyncio.sleep(hours * 3600)
+
+
+# Global retention service
+retention_service = RetentionService()
@@ -0,0 +1,167 @@
+"""Automatic retry policy and circuit breaker for NSE requests"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
+import httpx
+
+# Status codes worth retrying: throttling and server-side failures
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Decides whether a failed request is retried and how long to wait first
+
+    Timeouts, connection errors, throttling (429) and 5xx answers are
+    retryable; anything else, notably 404 for files NSE has not published,
+    is permanent. Delays grow exponentially with full jitter, and a
+    ``Retry-After`` header from the server takes precedence. A server asking
+    for more than ``max_delay`` is not retried early: the download gives up
+    and is picked up again by a later run.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        max_manual_retries: int = 5,
+    ):
+        """Initialize retry policy
+
+        Args:
+            max_attempts: Attempts per download, including the first one
+            base_delay: Delay cap in seconds before the first retry
+            max_delay: Longest delay waited before a retry
+            max_manual_retries: Retries allowed through /download/retry per download
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_manual_retries = max_manual_retries
+
+    def is_retryable(self, status_code: int | None = None, error: Exception | None = None) -> bool:
+        """Check whether a failure is transient"""
+        if status_code is not None:
+            return status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """Seconds to wait before retry number ``attempt`` (starting at 1)
+
+        Returns None if the server's Retry-After is longer than ``max_delay``,
+        in which case the request should not be retried now.
+        """
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of waiting when a host's circuit is open and its trial failed"""
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker
+
+    After ``failure_threshold`` consecutive transient failures the circuit for
+    that host opens and requests wait for ``reset_timeout`` seconds instead of
+    spending rate limit slots on a host that is down. Then a single trial
+    request is let through: success closes the circuit, failure reopens it.
+
+    Once a trial has failed the host is considered down: the requests that
+    were waiting for it, and any made before the next trial is due, fail
+    fast with ``CircuitOpenError`` rather than each waiting for a trial of
+    their own.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._openings: dict[str, int] = {}
+        self._trial_failed: set[str] = set()
+        self._trial_in_flight: set[str] = set()
+        self.lock = Lock()
+
+    def openings(self, host: str) -> int:
+        """Number of times the circuit for host has opened, to pass to seconds_until_allowed"""
+        with self.lock:
+            return self._openings.get(host, 0)
+
+    def seconds_until_allowed(self, host: str, openings: int | None = None) -> float:
+        """Return 0 if a request to host may proceed now, else how long to wait
+
+        When the open period has elapsed the first caller is granted the trial
+        request; others wait until it has finished. Raises CircuitOpenError
+        when waiting is pointless: a trial has failed since the circuit last
+        closed, or it has reopened since ``openings`` was taken.
+        """
+        with self.lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return 0.0
+
+            remaining = opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0 and host not in self._trial_in_flight:
+                self._trial_in_flight.add(host)
+                return 0.0
+            if host in self._trial_failed or (
+                openings is not None and openings != self._openings.get(host, 0)
+            ):
+                raise CircuitOpenError(f"Circuit open for {host}")
+            return remaining if remaining > 0 else min(1.0, self.reset_timeout)
+
+    def is_open(self, host: str) -> bool:
+        """Check whether requests to host are currently being held back"""
+        with self.lock:
+            return host in self._opened_at
+
+    def record_success(self, host: str):
+        """Close the circuit after a request the host answered normally"""
+        with self.lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial_failed.discard(host)
+            self._trial_in_flight.discard(host)
+
+    def release_trial(self, host: str):
+        """Let another request try the host when a trial ended without an answer"""
+        with self.lock:
+            self._trial_in_flight.discard(host)
+
+    def record_failure(self, host: str):
+        """Count a transient failure, opening the circuit at the threshold"""
+        with self.lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if host in self._trial_in_flight:
+                self._trial_failed.add(host)
+            if host in self._trial_in_flight or failures >= self.failure_threshold:
+                if host not in self._opened_at or host in self._trial_in_flight:
+                    self._openings[host] = self._openings.get(host, 0) + 1
+                self._opened_at[host] = time.monotonic()
+            self._trial_in_flight.discard(host)
+
+
+# Global retry policy and circuit breaker for NSE traffic
+retry_policy = RetryPolicy()
+circuit_breaker = CircuitBreaker()
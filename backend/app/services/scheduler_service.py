@@ -2,12 +2,16 @@
 
 import asyncio
 import time
+from datetime import datetime, timezone
 from threading import Thread
 
 import schedule
 
+from app.services.database import db
 from app.services.download_service import DownloadService
+from app.services.http_client import http_pool
 from app.services.parse_service import ParseService
+from app.services.trading_calendar import trading_calendar
 from app.services.utils import get_settings, log_message
 
 
@@ -20,44 +24,61 @@ class SchedulerService:
 
     def _run_automation(self):
         """Run the automation pipeline"""
+        try:
+            log_message("Scheduled automation started...")
+            settings = get_settings()
 
-        async def run():
-            try:
-                log_message("Scheduled automation started...")
-                settings = get_settings()
+            if not settings:
+                log_message("Settings not configured, skipping scheduled run")
+                return
 
-                if not settings:
-                    log_message("Settings not configured, skipping scheduled run")
-                    return
+            raw_path = settings.get("raw_path", "")
+            output_path = settings.get("output_path", "")
 
-                raw_path = settings.get("raw_path", "")
-                output_path = settings.get("output_path", "")
+            if not raw_path or not output_path:
+                log_message("Paths not configured, skipping scheduled run")
+                return
 
-                if not raw_path or not output_path:
-                    log_message("Paths not configured, skipping scheduled run")
-                    return
+            self._download(raw_path)
 
-                # Download files
-                download_service = DownloadService()
-                from datetime import datetime, timedelta, timezone
+            # Parsing is synchronous work, so it stays on this thread and off the app's loop
+            parse_service = ParseService()
+            asyncio.run(parse_service.parse_files(raw_path=raw_path, output_path=output_path))
 
-                today_dt = datetime.now(timezone.utc)
-                today = today_dt.strftime("%Y-%m-%d")
-                yesterday = (today_dt - timedelta(days=1)).strftime("%Y-%m-%d")
+            log_message("Scheduled automation completed")
+        except Exception as e:
+            log_message(f"Error in scheduled automation: {e!s}")
 
-                await download_service.download_files(
-                    start_date=yesterday, end_date=today, urls={}, raw_path=raw_path
-                )
+    def _download(self, raw_path: str):
+        """Download today's and the previous trading day's files"""
 
-                # Parse files
-                parse_service = ParseService()
-                await parse_service.parse_files(raw_path=raw_path, output_path=output_path)
+        async def run():
+            download_service = DownloadService()
+
+            # Fetch today plus the previous trading day (skipping weekends/holidays)
+            today_dt = datetime.now(timezone.utc)
+            today = today_dt.strftime("%Y-%m-%d")
+            yesterday = (
+                await db.aio.run(trading_calendar.previous_trading_day, today_dt.date())
+            ).isoformat()
+
+            await download_service.download_files(
+                start_date=yesterday, end_date=today, urls={}, raw_path=raw_path
+            )
+
+        loop = http_pool.home_loop
+        if loop is not None and loop.is_running():
+            # Run on the app's event loop so scheduled downloads share its connection pool
+            asyncio.run_coroutine_threadsafe(run(), loop).result()
+            return
 
-                log_message("Scheduled automation completed")
-            except Exception as e:
-                log_message(f"Error in scheduled automation: {e!s}")
+        async def run_standalone():
+            try:
+                await run()
+            finally:
+                await http_pool.aclose()
 
-        asyncio.run(run())
+        asyncio.run(run_standalone())
 
     def start(self, cron_schedule: str = None):
         """Start the scheduler"""
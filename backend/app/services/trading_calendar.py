@@ -0,0 +1,91 @@
+"""NSE trading calendar used to skip weekends and exchange holidays"""
+
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta, timezone
+
+from app.services.database import db
+from app.services.utils import get_settings, log_message
+
+# Runs in which every file for a date must be missing before it is learned as a holiday
+HOLIDAY_LEARN_THRESHOLD = 2
+
+# Files for more recent dates may simply not be published yet, so they are never learned
+HOLIDAY_LEARN_MIN_AGE_DAYS = 3
+
+# Longest stretch of consecutive non-trading days searched by previous_trading_day
+MAX_NON_TRADING_STREAK = 30
+
+
+class TradingCalendar:
+    """Calendar of NSE trading days
+
+    A day is a trading day unless it falls on a weekend, is listed in the
+    ``holidays`` setting (a list of YYYY-MM-DD strings), or has been learned
+    as a holiday because every file for it was missing on repeated runs.
+    """
+
+    def __init__(self, holidays: Iterable[str] | None = None):
+        """Initialize trading calendar
+
+        Args:
+            holidays: Holiday dates (YYYY-MM-DD). Read from settings when omitted.
+        """
+        self._holidays = set(holidays) if holidays is not None else None
+
+    def holidays(self) -> set[str]:
+        """Get configured and learned holiday dates"""
+        configured = self._holidays
+        if configured is None:
+            configured = set(get_settings().get("holidays", []))
+        return configured | db.get_learned_holidays()
+
+    def is_trading_day(self, day: date, holidays: set[str] | None = None) -> bool:
+        """Check whether the exchange trades on a given day"""
+        if day.weekday() >= 5:
+            return False
+        if holidays is None:
+            holidays = self.holidays()
+        return day.isoformat() not in holidays
+
+    def trading_days(self, start: date, end: date) -> list[date]:
+        """Get all trading days between start and end (inclusive)"""
+        holidays = self.holidays()
+        days = []
+        current = start
+        while current <= end:
+            if self.is_trading_day(current, holidays):
+                days.append(current)
+            current += timedelta(days=1)
+        return days
+
+    def previous_trading_day(self, day: date) -> date:
+        """Get the last trading day strictly before a given day"""
+        holidays = self.holidays()
+        current = day - timedelta(days=1)
+        for _ in range(MAX_NON_TRADING_STREAK):
+            if self.is_trading_day(current, holidays):
+                return current
+            current -= timedelta(days=1)
+        return current
+
+    def record_all_missing(self, date_str: str) -> bool:
+        """Record that every file for a date was missing (HTTP 404)
+
+        After HOLIDAY_LEARN_THRESHOLD such runs the date is learned as a
+        holiday and skipped from then on. Returns True if it was learned now.
+        """
+        day = date.fromisoformat(date_str)
+        today = datetime.now(timezone.utc).date()
+        if (today - day).days < HOLIDAY_LEARN_MIN_AGE_DAYS or not self.is_trading_day(day):
+            return False
+
+        if db.record_calendar_miss(date_str) < HOLIDAY_LEARN_THRESHOLD:
+            return False
+
+        db.mark_holiday(date_str)
+        log_message(f"Learned NSE holiday: {date_str} (all files missing on repeated runs)")
+        return True
+
+
+# Global trading calendar instance
+trading_calendar = TradingCalendar()
@@ -1,16 +1,25 @@
 """File verification service to check downloaded files"""
 
+import asyncio
+import os
 import zipfile
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 from pathlib import Path
 
 from app.services.database import db
+from app.services.trading_calendar import trading_calendar
+from app.services.utils import get_settings
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
 
 
 class VerificationService:
     """Service for verifying downloaded files"""
 
-    def __init__(self):
-        pass
+    def __init__(self, workers: int | None = None):
+        self.workers = workers
 
     def verify_zip_file(self, file_path: Path) -> dict[str, any]:
         """Verify a ZIP file is valid and can be extracted
@@ -164,65 +173,181 @@ class VerificationService:
             return {"valid": True, "error": None, "size": file_path.stat().st_size}
         return {"valid": False, "error": "File does not exist", "size": 0}
 
-    async def verify_downloads(
-        self, start_date: str, end_date: str, raw_path: str
-    ) -> dict[str, any]:
-        """Verify all downloaded files for a date range
-        Returns summary with valid/invalid files
+    def _worker_count(self) -> int:
+        workers = self.workers or int(get_settings().get("verification_workers", DEFAULT_WORKERS))
+        return max(1, workers)
+
+    def _check_file(self, file_info: dict, entry: dict | None) -> dict:
+        """Verify one file unless its cached result still applies; runs in the worker pool
+
+        A cached result is reused while the file's size, mtime and recorded
+        sha256 match. Returns dict with the 'file_info', its 'verification',
+        whether it was 'cached' and the 'cache_entry' to store, if any.
         """
-        raw_path_obj = Path(raw_path)
+        file_path = Path(file_info["file_path"])
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return {
+                "file_info": file_info,
+                "verification": self.verify_file(file_path),
+                "cached": False,
+                "cache_entry": None,
+            }
+
+        key = {
+            "file_path": str(file_path),
+            "size_bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_info.get("sha256"),
+        }
+        if entry and all(entry[field] == value for field, value in key.items()):
+            return {
+                "file_info": file_info,
+                "verification": entry["result"],
+                "cached": True,
+                "cache_entry": None,
+            }
 
-        verified_files = []
-        invalid_files = []
+        result = self.verify_file(file_path)
+        return {
+            "file_info": file_info,
+            "verification": result,
+            "cached": False,
+            "cache_entry": {**key, "result": result},
+        }
 
-        # Get downloads from database
-        downloads = db.get_downloads_by_date_range(start_date, end_date)
+    async def _collect_files(
+        self, start_date: str, end_date: str, raw_path: str
+    ) -> tuple[set[str], list[dict]]:
+        """Find the files to verify for a date range
 
-        for download in downloads:
-            file_path = Path(download["file_path"])
-            result = self.verify_file(file_path)
+        Returns the trading days in the range and one dict per file: the
+        download records for trading days, then any other files in raw_path.
+        Records for weekends and exchange holidays are skipped, since nothing
+        is published on those days.
+        """
+        raw_path_obj = Path(raw_path)
 
-            file_info = {
-                "download_id": download["id"],
+        # Get downloads for trading days from database
+        trading_days = {
+            day.isoformat()
+            for day in await db.aio.run(
+                trading_calendar.trading_days,
+                date.fromisoformat(start_date),
+                date.fromisoformat(end_date),
+            )
+        }
+        downloads = [
+            d
+            for d in await db.aio.get_downloads_by_date_range(start_date, end_date)
+            + await db.aio.get_archived_downloads(start_date, end_date)
+            if d["date_str"] in trading_days
+        ]
+
+        files = [
+            {
+                "download_id": download.get("id"),  # None for archived downloads
                 "file_name": download["file_name"],
                 "file_type": download["file_type"],
                 "date_str": download["date_str"],
-                "file_path": str(file_path),
-                "verification": result,
+                "file_path": str(Path(download["file_path"])),
+                "sha256": download.get("sha256"),
             }
-
-            if result.get("valid"):
-                verified_files.append(file_info)
-            else:
-                invalid_files.append(file_info)
+            for download in downloads
+        ]
 
         # Also check for files in directory that might not be in database
         if raw_path_obj.exists():
+            known_paths = {f["file_path"] for f in files}
             for file_path in raw_path_obj.iterdir():
-                if file_path.is_file():
-                    # Check if already verified
-                    already_verified = any(
-                        f["file_path"] == str(file_path) for f in verified_files + invalid_files
-                    )
-
-                    if not already_verified:
-                        result = self.verify_file(file_path)
-                        file_info = {
-                            "file_name": file_path.name,
-                            "file_path": str(file_path),
-                            "verification": result,
-                        }
-
-                        if result.get("valid"):
-                            verified_files.append(file_info)
-                        else:
-                            invalid_files.append(file_info)
+                # Skip incomplete downloads
+                if (
+                    file_path.is_file()
+                    and file_path.suffix != ".part"
+                    and str(file_path) not in known_paths
+                ):
+                    files.append({"file_name": file_path.name, "file_path": str(file_path)})
+
+        return trading_days, files
+
+    async def iter_verifications(self, files: list[dict]) -> AsyncIterator[dict]:
+        """Verify files on the worker pool, yielding each result as it finishes
+
+        Files are verified on ``verification_workers`` threads; zlib and the
+        CRC check release the GIL, so ZIP tests run in parallel while the
+        event loop stays free. Each file dict gets its 'verification' result;
+        yields dicts with the 'file_info' and whether the result was 'cached'.
+        """
+        cached = await db.aio.get_verifications([f["file_path"] for f in files])
 
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(
+            max_workers=self._worker_count(), thread_name_prefix="homestock-verify"
+        )
+        fresh = []
+        try:
+            checks = [
+                loop.run_in_executor(pool, self._check_file, f, cached.get(f["file_path"]))
+                for f in files
+            ]
+            for check in asyncio.as_completed(checks):
+                checked = await check
+                file_info = checked["file_info"]
+                file_info.pop("sha256", None)
+                file_info["verification"] = checked["verification"]
+                if checked["cache_entry"]:
+                    fresh.append(checked["cache_entry"])
+                yield {"file_info": file_info, "cached": checked["cached"]}
+        finally:
+            # Don't wait for (or start) checks nobody will read
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if fresh:
+            await db.aio.save_verifications(fresh)
+
+    def _summary(self, trading_days: set[str], files: list[dict], cached_count: int) -> dict:
+        invalid_count = sum(1 for f in files if not f["verification"].get("valid"))
         return {
             "success": True,
-            "verified_count": len(verified_files),
-            "invalid_count": len(invalid_files),
-            "verified_files": verified_files,
-            "invalid_files": invalid_files,
-            "all_valid": len(invalid_files) == 0,
+            "trading_days": len(trading_days),
+            "verified_count": len(files) - invalid_count,
+            "invalid_count": invalid_count,
+            "cached_count": cached_count,
+            "all_valid": invalid_count == 0,
+        }
+
+    async def stream_downloads(
+        self, start_date: str, end_date: str, raw_path: str
+    ) -> AsyncIterator[dict]:
+        """Verify all downloaded files for a date range, yielding results as they finish
+
+        Yields one 'file' event per file, in completion order, then a
+        'summary' event with the counts.
+        """
+        trading_days, files = await self._collect_files(start_date, end_date, raw_path)
+
+        cached_count = 0
+        async for checked in self.iter_verifications(files):
+            cached_count += checked["cached"]
+            yield {"type": "file", "cached": checked["cached"], **checked["file_info"]}
+
+        yield {"type": "summary", **self._summary(trading_days, files, cached_count)}
+
+    async def verify_downloads(
+        self, start_date: str, end_date: str, raw_path: str
+    ) -> dict[str, any]:
+        """Verify all downloaded files for a date range
+        Returns summary with valid/invalid files
+        """
+        trading_days, files = await self._collect_files(start_date, end_date, raw_path)
+
+        cached_count = 0
+        async for checked in self.iter_verifications(files):
+            cached_count += checked["cached"]
+
+        return {
+            **self._summary(trading_days, files, cached_count),
+            "verified_files": [f for f in files if f["verification"].get("valid")],
+            "invalid_files": [f for f in files if not f["verification"].get("valid")],
         }
@@ -0,0 +1,107 @@
+"""Tests for checkpointed historical backfills"""
+
+import asyncio
+
+import pytest
+
+from app.services import backfill_service, trading_calendar
+from app.services.backfill_service import BackfillService
+
+
+class _RecordingDownloads:
+    """Stand-in for DownloadService that records the chunks it is asked for"""
+
+    def __init__(self, block_on_call: int | None = None):
+        self.calls = []
+        self.block_on_call = block_on_call
+
+    async def download_files(self, start_date, end_date, urls, raw_path):
+        self.calls.append((start_date, end_date))
+        if len(self.calls) == self.block_on_call:
+            await asyncio.sleep(10)
+        return {"downloaded": [f"file_{start_date}"], "missing": []}
+
+
+@pytest.fixture
+def backfill_db(monkeypatch, temp_db):
+    """Point the backfill service and trading calendar at a temporary database"""
+    monkeypatch.setattr(backfill_service, "db", temp_db)
+    monkeypatch.setattr(trading_calendar, "db", temp_db)
+    return temp_db
+
+
+async def _create(service, direction):
+    return await service.create(
+        "2023-12-01",
+        "2023-12-20",
+        urls={},
+        raw_path="/tmp/raw",
+        direction=direction,
+        chunk_days=7,
+    )
+
+
+async def test_newest_first_checkpoints_each_chunk(backfill_db):
+    """Chunks are fetched from the end of the range backwards"""
+    downloads = _RecordingDownloads()
+    service = BackfillService(download_service=downloads)
+    backfill_id = await _create(service, "newest_first")
+
+    result = await service.run(backfill_id)
+
+    assert downloads.calls == [
+        ("2023-12-14", "2023-12-20"),
+        ("2023-12-07", "2023-12-13"),
+        ("2023-12-01", "2023-12-06"),
+    ]
+    assert result["status"] == "completed"
+    assert result["cursor"] == "2023-11-30"
+    assert result["days_done"] == result["days_total"] == 14
+    assert result["files_downloaded"] == 3
+    assert result["percent"] == 100.0
+    assert result["eta_seconds"] == 0
+
+
+async def test_oldest_first(backfill_db):
+    """Chunks can also be fetched from the start of the range forwards"""
+    downloads = _RecordingDownloads()
+    service = BackfillService(download_service=downloads)
+
+    await service.run(await _create(service, "oldest_first"))
+
+    assert downloads.calls[0] == ("2023-12-01", "2023-12-07")
+    assert downloads.calls[-1] == ("2023-12-15", "2023-12-20")
+
+
+async def test_interrupted_backfill_resumes_from_cursor(backfill_db):
+    """An interrupted backfill is paused and continues with the unfinished chunk"""
+    service = BackfillService(download_service=_RecordingDownloads(block_on_call=2))
+    backfill_id = await _create(service, "newest_first")
+
+    task = asyncio.create_task(service.run(backfill_id))
+    while len(service.download_service.calls) < 2:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    paused = backfill_db.get_backfill(backfill_id)
+    assert paused["status"] == "paused"
+    assert paused["cursor"] == "2023-12-13"
+    assert paused["days_done"] == 5
+
+    resumed = _RecordingDownloads()
+    result = await BackfillService(download_service=resumed).run(backfill_id)
+
+    assert resumed.calls == [("2023-12-07", "2023-12-13"), ("2023-12-01", "2023-12-06")]
+    assert result["status"] == "completed"
+    assert result["days_done"] == 14
+
+
+async def test_create_validates_arguments(backfill_db):
+    """Reversed ranges and unknown directions are rejected"""
+    service = BackfillService(download_service=_RecordingDownloads())
+    with pytest.raises(ValueError, match="start_date"):
+        await service.create("2023-12-20", "2023-12-01", urls={}, raw_path="")
+    with pytest.raises(ValueError, match="direction"):
+        await service.create("2023-12-01", "2023-12-20", urls={}, raw_path="", direction="sideways")
@@ -2,6 +2,7 @@
 
 import shutil
 import tempfile
+import threading
 from pathlib import Path
 
 import pytest
@@ -129,3 +130,146 @@ def test_retry_download(temp_db):
     download = temp_db.get_download(download_id)
     assert download["status"] == "pending"
     assert download["error_message"] is None
+
+
+def test_connection_is_reused_and_uses_wal(temp_db):
+    """Each thread keeps one WAL-mode connection open"""
+    with temp_db._get_connection() as first, temp_db._get_connection() as second:
+        assert first is second
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(temp_db.get_download(1)))
+    thread.start()
+    thread.join()
+    assert other == [None]
+
+
+def test_readers_are_not_blocked_by_writer(temp_db):
+    """A reader in another thread sees committed data while a write is in progress"""
+    download_id = temp_db.create_download("f.zip", "fo_udiff", "http://x", "2023-12-01", "/tmp/f")
+
+    with temp_db._get_connection() as conn:
+        conn.execute("UPDATE downloads SET status = 'downloading' WHERE id = ?", (download_id,))
+        # Uncommitted write held open; a reader must not wait for it
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(temp_db.get_download(download_id)["status"])
+        )
+        thread.start()
+        thread.join(timeout=2)
+        conn.commit()
+
+    assert result == ["pending"]
+
+
+def test_failed_block_rolls_back(temp_db):
+    """An exception inside a block discards its uncommitted changes"""
+    download_id = temp_db.create_download("f.zip", "fo_udiff", "http://x", "2023-12-01", "/tmp/f")
+
+    def fail_midway():
+        with temp_db._get_connection() as conn:
+            conn.execute("UPDATE downloads SET status = 'completed' WHERE id = ?", (download_id,))
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        fail_midway()
+
+    assert temp_db.get_download(download_id)["status"] == "pending"
+
+
+def test_bulk_create_and_update(temp_db):
+    """Bulk methods create and update many records in one go"""
+    records = [
+        {
+            "file_name": f"f{i}.zip",
+            "file_type": "fo_udiff",
+            "url": f"http://x/{i}",
+            "date_str": f"2023-12-0{i}",
+            "file_path": f"/tmp/f{i}",
+        }
+        for i in range(1, 4)
+    ]
+    temp_db.create_download("other.zip", "cm_udiff", "http://y", "2023-11-30", "/tmp/o")
+
+    ids = temp_db.create_downloads_bulk(records)
+
+    assert [temp_db.get_download(i)["file_name"] for i in ids] == ["f1.zip", "f2.zip", "f3.zip"]
+    assert temp_db.create_downloads_bulk([]) == []
+
+    temp_db.update_statuses_bulk(ids[:2], "failed", error_message="Boom")
+    assert sorted(d["id"] for d in temp_db.get_downloads_by_status("failed")) == ids[:2]
+    assert temp_db.get_download(ids[0])["error_message"] == "Boom"
+    assert temp_db.get_download(ids[2])["status"] == "pending"
+
+
+def test_create_download_reuses_row_for_same_file(temp_db):
+    """A second attempt at the same file type and day resets the existing row"""
+    first = temp_db.create_download("f.zip", "fo_udiff", "http://x", "2023-12-01", "/tmp/f")
+    temp_db.update_download_status(first, "failed", error_message="Timeout", bytes_downloaded=10)
+
+    second = temp_db.create_download("f.zip", "fo_udiff", "http://y", "2023-12-01", "/tmp/f")
+
+    download = temp_db.get_download(second)
+    assert second == first
+    assert download["status"] == "pending"
+    assert download["url"] == "http://y"
+    assert download["error_message"] is None
+    assert download["bytes_downloaded"] == 10
+    assert len(temp_db.get_downloads_by_date_range("2023-12-01", "2023-12-01")) == 1
+
+
+def test_duplicate_rows_are_compacted(temp_db):
+    """Opening a database from before the unique key keeps one row per file"""
+    with temp_db._get_connection() as conn:
+        conn.execute("DROP INDEX idx_date_file_type")
+        conn.executemany(
+            """
+            INSERT INTO downloads (file_name, file_type, url, date_str, file_path, status)
+            VALUES ('f.zip', 'fo_udiff', 'http://x', '2023-12-01', '/tmp/f', ?)
+        """,
+            [("failed",), ("completed",), ("failed",)],
+        )
+        conn.commit()
+
+    migrated = Database(db_path=temp_db.db_path)
+
+    downloads = migrated.get_downloads_by_date_range("2023-12-01", "2023-12-01")
+    assert [d["status"] for d in downloads] == ["completed"]
+
+
+async def test_async_view_runs_on_database_thread(temp_db):
+    """db.aio awaits the same methods on the dedicated database thread"""
+    download_id = await temp_db.aio.create_download(
+        "f.zip", "fo_udiff", "http://x", "2023-12-01", "/tmp/f"
+    )
+
+    assert (await temp_db.aio.get_download(download_id))["file_name"] == "f.zip"
+    thread = await temp_db.aio.run(threading.current_thread)
+    assert thread.name.startswith("homestock-db")
+    assert thread is not threading.current_thread()
+
+
+def test_change_feed_tracks_revisions(temp_db):
+    """Inserts, updates and deletes are reported after the revision a client saw"""
+    first = temp_db.create_download("a.zip", "fo_udiff", "http://a", "2023-12-01", "/tmp/a")
+    second = temp_db.create_download("b.zip", "cm_udiff", "http://b", "2023-12-01", "/tmp/b")
+    seen = temp_db.get_download_changes(0)
+    assert [d["id"] for d in seen["downloads"]] == [first, second]
+    assert seen["active"] == 2
+
+    temp_db.update_download_status(first, "completed")
+    with temp_db._get_connection() as conn:
+        conn.execute("DELETE FROM downloads WHERE id = ?", (second,))
+        conn.commit()
+
+    changes = temp_db.get_download_changes(seen["revision"])
+    assert [(d["id"], d["status"]) for d in changes["downloads"]] == [(first, "completed")]
+    assert changes["deleted"] == [second]
+    assert changes["active"] == 0
+    assert temp_db.get_download_changes(changes["revision"])["downloads"] == []
+
+    page = temp_db.get_download_changes(0, limit=1)
+    assert page["revision"] < changes["revision"]
+    assert page["active"] is None  # More changes are waiting
@@ -1,13 +1,24 @@
 """Tests for download endpoints"""
 
+import asyncio
+import hashlib
 import shutil
 import tempfile
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+from app.api import download as download_api
 from app.main import app
+from app.services import download_service, job_service, progress_registry, trading_calendar
+from app.services.download_service import CHUNK_SIZE, DownloadService
+from app.services.job_service import JobQueue
+from app.services.rate_limiter import HostRateLimiter
+from app.services.retry_policy import CircuitBreaker, RetryPolicy
 
 client = TestClient(app)
 
@@ -20,8 +31,13 @@ def temp_download_dir():
     shutil.rmtree(temp_dir)
 
 
-def test_download_endpoint_basic(temp_download_dir):
-    """Test basic download endpoint"""
+def test_download_endpoint_basic(monkeypatch, temp_db, temp_download_dir):
+    """The endpoint queues a download job and returns its ID"""
+    monkeypatch.setattr(job_service, "db", temp_db)
+    queue = JobQueue()  # Not started, so the job stays queued
+    queue.register("download", job_service.run_download_job)
+    monkeypatch.setattr(download_api, "job_queue", queue)
+
     response = client.post(
         "/download/",
         json={
@@ -34,9 +50,12 @@ def test_download_endpoint_basic(temp_download_dir):
 
     assert response.status_code == 200
     data = response.json()
-    assert "success" in data
-    assert "downloaded" in data
-    assert "missing" in data
+    assert data["success"] == True
+    assert data["status"] == "queued"
+    job = temp_db.get_job(data["job_id"])
+    assert job["kind"] == "download"
+    assert job["status"] == "queued"
+    assert job["params"]["raw_path"] == str(temp_download_dir)
 
 
 def test_download_endpoint_invalid_date():
@@ -103,6 +122,96 @@ def test_download_status_with_status_filter():
     assert "downloads" in data
 
 
+@pytest.fixture
+def status_db(monkeypatch, temp_db):
+    """Temporary database behind the download endpoints, with a few records"""
+    monkeypatch.setattr(download_api, "db", temp_db)
+    for date_str, file_type, status in [
+        ("2023-12-01", "cm_delivery", "completed"),
+        ("2023-12-01", "fo_udiff", "failed"),
+        ("2023-12-04", "cm_delivery", "pending"),
+        ("2023-12-04", "fo_udiff", "failed"),
+        ("2023-12-05", "fo_udiff", "completed"),
+    ]:
+        download_id = temp_db.create_download(
+            f"{file_type}_{date_str}.zip", file_type, "http://x", date_str, "/tmp/x"
+        )
+        temp_db.update_download_status(download_id, status)
+    return temp_db
+
+
+def test_download_status_pages_with_cursor(status_db):
+    """Pages follow the (date, file type) key and only carry the requested fields"""
+    seen = []
+    cursor = None
+    while True:
+        params = {"start_date": "2023-12-01", "limit": 2, "fields": "date_str,file_type"}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/download/status", params=params).json()
+        assert data["success"] == True
+        seen.extend((d["date_str"], d["file_type"]) for d in data["downloads"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [
+        ("2023-12-05", "fo_udiff"),
+        ("2023-12-04", "cm_delivery"),
+        ("2023-12-04", "fo_udiff"),
+        ("2023-12-01", "cm_delivery"),
+        ("2023-12-01", "fo_udiff"),
+    ]
+    assert set(data["downloads"][0]) == {"date_str", "file_type"}
+
+
+def test_download_status_combines_filters(status_db):
+    """Status lists, file types and dates are applied together"""
+    data = client.get(
+        "/download/status", params={"status": "failed,pending", "file_type": "fo_udiff"}
+    ).json()
+    assert [d["date_str"] for d in data["downloads"]] == ["2023-12-04", "2023-12-01"]
+
+    data = client.get("/download/status").json()
+    assert {d["status"] for d in data["downloads"]} == {"failed", "pending"}
+
+    data = client.get("/download/status", params={"fields": "id,password"}).json()
+    assert data["success"] == False
+
+
+def test_download_changes_feed(status_db):
+    """Polling with the last revision returns only what changed, or 304"""
+    data = client.get("/download/changes").json()
+    assert len(data["downloads"]) == 5
+    assert data["active"] == 1
+
+    response = client.get("/download/changes", params={"since": data["revision"]})
+    assert response.status_code == 304
+
+    failed = status_db.get_downloads_by_status("failed")[0]["id"]
+    status_db.reset_download(failed)
+    data = client.get(
+        "/download/changes", params={"since": data["revision"], "fields": "id,status"}
+    ).json()
+    assert data["downloads"] == [{"id": failed, "status": "pending"}]
+
+    data = client.get("/download/changes", params={"since": data["revision"] + 100}).json()
+    assert data["reset"] == True
+    assert len(data["downloads"]) == 5
+
+
+def test_download_summary(status_db):
+    """Counts are grouped by status, file type and date"""
+    data = client.get("/download/summary", params={"start_date": "2023-12-02"}).json()
+
+    assert data["success"] == True
+    assert data["total"] == 3
+    assert data["by_status"] == {"completed": 1, "failed": 1, "pending": 1}
+    assert data["by_file_type"]["fo_udiff"] == {"completed": 1, "failed": 1}
+    assert data["by_date"]["2023-12-04"] == {"failed": 1, "pending": 1}
+    assert list(data["by_date"]) == sorted(data["by_date"], reverse=True)
+
+
 def test_get_download_by_id():
     """Test getting download by ID"""
     # First create a download
@@ -168,3 +277,526 @@ def test_retry_nonexistent_download():
     assert response.status_code == 200
     data = response.json()
     assert data.get("success") == False
+
+
+@pytest.fixture
+def service_env(monkeypatch, temp_db):
+    """Point the download service at a temp database and an unrestricted rate limiter
+
+    Retries happen without delay and each test gets its own circuit breaker.
+    """
+    monkeypatch.setattr(download_service, "db", temp_db)
+    monkeypatch.setattr(trading_calendar, "db", temp_db)
+    monkeypatch.setattr(progress_registry, "db", temp_db)
+    monkeypatch.setattr(
+        download_service, "nse_rate_limiter", HostRateLimiter(max_calls=1000, time_window=1)
+    )
+    monkeypatch.setattr(download_service, "retry_policy", RetryPolicy(base_delay=0))
+    monkeypatch.setattr(download_service, "circuit_breaker", CircuitBreaker())
+    return temp_db
+
+
+def _mock_client(handler):
+    """Create an httpx client that answers requests with the given handler"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def test_download_files_runs_concurrently(service_env, temp_download_dir):
+    """download_files should fetch several files at once, bounded by max_concurrency"""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, content=b"data")
+
+    service = DownloadService(max_concurrency=3, client=_mock_client(handler))
+    result = await service.download_files(
+        "2023-12-04", "2023-12-05", urls={}, raw_path=str(temp_download_dir)
+    )
+
+    assert len(result["downloaded"]) == 12
+    assert result["missing"] == []
+    assert 1 < peak <= 3
+    assert (temp_download_dir / "cm_delivery_2023-12-04.DAT").read_bytes() == b"data"
+
+
+async def test_download_files_reports_missing(service_env, temp_download_dir):
+    """Files answered with an HTTP error are reported as missing and marked failed"""
+
+    def handler(request):
+        if "MTO_" in str(request.url):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"data")
+
+    result = await DownloadService(client=_mock_client(handler)).download_files(
+        "2023-12-04", "2023-12-04", urls={}, raw_path=str(temp_download_dir)
+    )
+
+    assert len(result["downloaded"]) == 5
+    assert len(result["missing"]) == 1
+    assert result["missing"][0].startswith("cm_delivery_2023-12-04")
+    assert service_env.get_downloads_by_status("failed")[0]["file_type"] == "cm_delivery"
+
+
+async def test_download_files_fetches_shared_urls_once(service_env, temp_download_dir):
+    """File types resolving to the same URL are downloaded once and linked"""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=b"data")
+
+    result = await DownloadService(client=_mock_client(handler)).download_files(
+        "2023-12-04", "2023-12-04", urls={}, raw_path=str(temp_download_dir)
+    )
+
+    assert len(requested) == 4
+    assert len(set(requested)) == 4
+    assert len(result["downloaded"]) == 6
+    assert (temp_download_dir / "cm_udiff_2023-12-04.zip").read_bytes() == b"data"
+    assert (temp_download_dir / "fo_participant_oi_2023-12-04.zip").read_bytes() == b"data"
+    assert len(service_env.get_downloads_by_status("completed")) == 6
+
+
+async def test_download_files_plans_records_in_bulk(monkeypatch, service_env, temp_download_dir):
+    """Pending records for the whole range are created before any request is made"""
+    bulk_calls = []
+    create_bulk = service_env.create_downloads_bulk
+
+    def record_bulk(records):
+        bulk_calls.append(len(records))
+        return create_bulk(records)
+
+    def handler(request):
+        assert len(service_env.get_downloads_by_status("pending")) > 0
+        return httpx.Response(200, content=b"data")
+
+    monkeypatch.setattr(service_env, "create_downloads_bulk", record_bulk)
+    monkeypatch.setattr(service_env, "create_download", None)  # No per-file inserts
+    service = DownloadService(client=_mock_client(handler))
+    result = await service.download_files(
+        "2023-12-04", "2023-12-05", urls={}, raw_path=str(temp_download_dir)
+    )
+    assert bulk_calls == [12]
+    assert len(service_env.get_downloads_by_status("completed")) == 12
+
+    # Completed files are not planned again
+    result = await service.download_files(
+        "2023-12-04", "2023-12-05", urls={}, raw_path=str(temp_download_dir)
+    )
+    assert bulk_calls == [12, 0]
+    assert len(result["downloaded"]) == 12
+
+
+async def test_cancelled_download_files_leaves_no_pending_records(
+    monkeypatch, service_env, temp_download_dir
+):
+    """Cancelling a range marks its unfinished records failed
+
+    Writes of the 'downloading' status are slowed down, so some are still
+    running when the cancellation cleanup is submitted.
+    """
+    started = asyncio.Event()
+    update_status = service_env.update_download_status
+
+    def slow_update_status(download_id, status, **kwargs):
+        if status == "downloading":
+            time.sleep(0.05)
+        update_status(download_id, status, **kwargs)
+
+    monkeypatch.setattr(service_env, "update_download_status", slow_update_status)
+
+    async def handler(request):
+        started.set()
+        await asyncio.Event().wait()  # Never answers
+
+    service = DownloadService(client=_mock_client(handler))
+    task = asyncio.create_task(
+        service.download_files("2023-12-04", "2023-12-05", urls={}, raw_path=str(temp_download_dir))
+    )
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert service_env.get_downloads_by_status("pending") == []
+    assert service_env.get_downloads_by_status("downloading") == []
+    failed = service_env.get_downloads_by_status("failed")
+    assert len(failed) == 12
+    assert all(d["error_message"] == "Cancelled" for d in failed)
+
+
+async def test_download_files_skips_weekends(service_env, temp_download_dir):
+    """Weekend dates are not requested at all"""
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=b"data")
+
+    # 2023-12-02 and 2023-12-03 are a Saturday and Sunday
+    result = await DownloadService(client=_mock_client(handler)).download_files(
+        "2023-12-01", "2023-12-03", urls={}, raw_path=str(temp_download_dir)
+    )
+
+    assert len(requested) == 4
+    assert all(name.endswith(("2023-12-01.zip", "2023-12-01.DAT")) for name in result["downloaded"])
+
+
+class _InterruptedStream(httpx.AsyncByteStream):
+    """Response body that fails after sending its first bytes"""
+
+    def __init__(self, first: bytes):
+        self.first = first
+
+    async def __aiter__(self):
+        yield self.first
+        raise httpx.ReadTimeout("connection dropped")
+
+
+async def test_interrupted_download_resumes_with_range(service_env, temp_download_dir):
+    """A dropped transfer keeps its .part file and the retry continues from the offset"""
+    ranges = []
+    first = b"a" * CHUNK_SIZE
+
+    def interrupted(request):
+        return httpx.Response(200, stream=_InterruptedStream(first))
+
+    def resumed(request):
+        ranges.append(request.headers.get("Range"))
+        return httpx.Response(206, content=b"tail")
+
+    result = await DownloadService(client=_mock_client(interrupted)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+    output = temp_download_dir / "cm_delivery_2023-12-04.DAT"
+    part = temp_download_dir / "cm_delivery_2023-12-04.DAT.part"
+
+    assert result["success"] == False
+    assert not output.exists()
+    assert part.read_bytes() == first
+    assert service_env.get_download(result["download_id"])["bytes_downloaded"] == CHUNK_SIZE
+
+    retry = await DownloadService(client=_mock_client(resumed)).retry_download(
+        result["download_id"]
+    )
+
+    assert retry["success"] == True
+    assert ranges == [f"bytes={CHUNK_SIZE}-"]
+    assert output.read_bytes() == first + b"tail"
+    assert not part.exists()
+    download = service_env.get_download(result["download_id"])
+    assert download["bytes_downloaded"] == CHUNK_SIZE + 4
+    assert download["sha256"] == hashlib.sha256(first + b"tail").hexdigest()
+
+
+async def test_resume_sends_if_range_and_restarts_on_change(service_env, temp_download_dir):
+    """A resumed request carries If-Range; a file changed since is downloaded in full"""
+    if_ranges = []
+
+    def interrupted(request):
+        return httpx.Response(
+            200, headers={"ETag": '"v1"'}, stream=_InterruptedStream(b"a" * CHUNK_SIZE)
+        )
+
+    def changed(request):
+        if_ranges.append(request.headers.get("If-Range"))
+        return httpx.Response(200, headers={"ETag": '"v2"'}, content=b"new file")
+
+    result = await DownloadService(client=_mock_client(interrupted)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+    retry = await DownloadService(client=_mock_client(changed)).retry_download(
+        result["download_id"]
+    )
+
+    assert retry["success"] == True
+    assert if_ranges == ['"v1"']
+    assert (temp_download_dir / "cm_delivery_2023-12-04.DAT").read_bytes() == b"new file"
+    assert service_env.get_download(result["download_id"])["etag"] == '"v2"'
+
+
+async def test_downloads_to_one_path_are_serialized(service_env, temp_download_dir):
+    """Concurrent downloads of the same file never share its .part file at once"""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, content=b"data")
+
+    service = DownloadService(client=_mock_client(handler))
+    output = temp_download_dir / "cm_delivery_2023-12-04.DAT"
+    results = await asyncio.gather(
+        *(service._download_file_with_progress("https://example.com/f", output) for _ in range(3))
+    )
+
+    assert all(r["success"] for r in results)
+    assert peak == 1
+    assert output.read_bytes() == b"data"
+
+
+async def test_resume_restarts_when_range_is_ignored(service_env, temp_download_dir):
+    """A server answering 200 to a Range request replaces the partial data"""
+    (temp_download_dir / "cm_delivery_2023-12-04.DAT.part").write_bytes(b"stale")
+
+    def handler(request):
+        return httpx.Response(200, content=b"complete")
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == True
+    assert (temp_download_dir / "cm_delivery_2023-12-04.DAT").read_bytes() == b"complete"
+
+
+async def test_repeat_download_uses_conditional_get(monkeypatch, service_env, temp_download_dir):
+    """A re-fetch sends the stored validators and treats 304 as a free cache hit"""
+    limiter = HostRateLimiter(max_calls=1000, time_window=3600)
+    monkeypatch.setattr(download_service, "nse_rate_limiter", limiter)
+    conditional = []
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            conditional.append(request.headers.get("If-Modified-Since"))
+            return httpx.Response(304)
+        return httpx.Response(
+            200,
+            content=b"data",
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 04 Dec 2023 18:00:00 GMT"},
+        )
+
+    service = DownloadService(client=_mock_client(handler))
+    first = await service.download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+    service_env.update_download_status(first["download_id"], "failed")
+
+    second = await service.download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert second["success"] == True
+    assert conditional == ["Mon, 04 Dec 2023 18:00:00 GMT"]
+    (bucket,) = limiter.buckets.values()
+    assert bucket.tokens == pytest.approx(999, abs=0.1)  # Only the first request cost a token
+    assert (temp_download_dir / "cm_delivery_2023-12-04.DAT").read_bytes() == b"data"
+    assert service_env.get_download(second["download_id"])["status"] == "completed"
+
+
+async def test_download_progress_is_not_written_per_chunk(
+    monkeypatch, service_env, temp_download_dir
+):
+    """A multi-chunk download only checkpoints progress a handful of times"""
+    writes = []
+    original = service_env.update_download_status
+
+    def counting_update(download_id, status, **kwargs):
+        writes.append(status)
+        original(download_id, status, **kwargs)
+
+    monkeypatch.setattr(service_env, "update_download_status", counting_update)
+
+    def handler(request):
+        return httpx.Response(200, content=b"x" * CHUNK_SIZE * 40)
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == True
+    assert writes[-1] == "completed"
+    assert len(writes) <= 6
+
+
+async def test_download_records_checksum_and_metadata(service_env, temp_download_dir):
+    """SHA-256, size and HTTP metadata are captured while streaming"""
+    body = b"y" * (CHUNK_SIZE * 3 + 17)
+
+    def handler(request):
+        return httpx.Response(200, content=body, headers={"Content-Type": "application/zip"})
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "fo_bhavcopy", "2023-12-04", "", str(temp_download_dir)
+    )
+    download = service_env.get_download(result["download_id"])
+
+    assert download["sha256"] == hashlib.sha256(body).hexdigest()
+    assert download["size_bytes"] == len(body)
+    assert download["http_status"] == 200
+    assert download["content_type"] == "application/zip"
+    assert service_env.get_downloads_by_hash(download["sha256"])[0]["id"] == download["id"]
+
+
+async def test_transient_errors_are_retried(service_env, temp_download_dir):
+    """5xx and 429 answers are retried, honouring Retry-After"""
+    answers = [
+        httpx.Response(503),
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(200, content=b"data"),
+    ]
+
+    def handler(request):
+        return answers.pop(0)
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == True
+    assert answers == []
+    assert service_env.get_download(result["download_id"])["status"] == "completed"
+
+
+async def test_missing_files_are_not_retried(service_env, temp_download_dir):
+    """A 404 is permanent and fails after a single request"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == False
+    assert result["status_code"] == 404
+    assert len(requests) == 1
+
+
+async def test_long_retry_after_is_not_cut_short(service_env, temp_download_dir):
+    """A Retry-After beyond max_delay fails the download instead of retrying early"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503, headers={"Retry-After": "3600"})
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == False
+    assert result["status_code"] == 503
+    assert len(requests) == 1
+
+
+async def test_open_circuit_holds_back_requests(monkeypatch, service_env, temp_download_dir):
+    """Once the breaker opens, requests wait for the host instead of hammering it"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    monkeypatch.setattr(download_service, "circuit_breaker", breaker)
+    requested_at = []
+
+    def handler(request):
+        requested_at.append(asyncio.get_running_loop().time())
+        return httpx.Response(500 if len(requested_at) <= 2 else 200, content=b"ok")
+
+    result = await DownloadService(client=_mock_client(handler)).download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert result["success"] == True
+    assert requested_at[2] - requested_at[1] >= 0.2
+    assert breaker.openings("www.nseindia.com") == 1
+    assert not breaker.is_open("www.nseindia.com")
+
+
+async def test_outage_fails_fast_once_trial_fails(monkeypatch, service_env, temp_download_dir):
+    """An unreachable host costs one open period, not one per queued download"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    monkeypatch.setattr(download_service, "circuit_breaker", breaker)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ConnectError("offline")
+
+    started = asyncio.get_running_loop().time()
+    result = await DownloadService(client=_mock_client(handler)).download_files(
+        "2023-12-04", "2023-12-06", urls={}, raw_path=str(temp_download_dir)
+    )
+
+    assert result["downloaded"] == []
+    assert len(result["missing"]) == 18
+    assert asyncio.get_running_loop().time() - started < 1.0
+    assert len(requests) < 12
+    failed = service_env.get_downloads_by_status("failed")
+    assert any(d["error_message"].startswith("Circuit open") for d in failed)
+
+
+async def test_not_found_is_cached(service_env, temp_download_dir):
+    """A 404 for an old date is remembered and not requested again"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    service = DownloadService(client=_mock_client(handler))
+    first = await service.download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+    second = await service.download_single_file(
+        "cm_delivery", "2023-12-04", "", str(temp_download_dir)
+    )
+
+    assert first["status_code"] == second["status_code"] == 404
+    assert second["cached"] == True
+    assert "download_id" not in second
+    assert len(requests) == 1
+
+
+async def test_old_all_missing_date_is_learned_from_cached_404s(service_env, temp_download_dir):
+    """A past date with nothing published becomes a holiday on the second run"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    service = DownloadService(client=_mock_client(handler))
+    for _ in range(2):
+        await service.download_files(
+            "2023-12-04", "2023-12-04", urls={}, raw_path=str(temp_download_dir)
+        )
+
+    assert len(requests) == 4  # The second run is answered from the cache
+    assert "2023-12-04" in service_env.get_learned_holidays()
+
+
+async def test_not_found_cache_expires_for_recent_dates(service_env, temp_download_dir):
+    """Recent dates are asked about again once their short TTL has passed"""
+    requests = []
+    recent = datetime.now(timezone.utc).date().isoformat()
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404 if len(requests) == 1 else 200, content=b"late")
+
+    service = DownloadService(client=_mock_client(handler))
+    await service.download_single_file("cm_delivery", recent, "", str(temp_download_dir))
+    url = requests[0].url
+
+    with service_env._get_connection() as conn:
+        conn.execute(
+            "UPDATE not_found_cache SET checked_at = datetime('now', '-2 hours') WHERE url = ?",
+            (str(url),),
+        )
+        conn.commit()
+
+    result = await service.download_single_file("cm_delivery", recent, "", str(temp_download_dir))
+
+    assert result["success"] == True
+    assert len(requests) == 2
+    assert service_env.get_not_found(str(url)) is None
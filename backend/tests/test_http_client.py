@@ -0,0 +1,56 @@
+"""Tests for the shared HTTP client pool"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import http_client
+from app.services.http_client import HttpClientPool, http_pool
+
+
+async def test_client_is_shared_within_a_loop():
+    """Repeated lookups on one event loop return the same keep-alive client"""
+    pool = HttpClientPool()
+    client = pool.get_client()
+
+    assert pool.get_client() is client
+
+    await pool.aclose()
+    assert client.is_closed
+    assert pool.get_client() is not client
+    await pool.aclose()
+
+
+def test_each_loop_gets_its_own_client():
+    """Clients are bound to the event loop that created them"""
+    pool = HttpClientPool()
+
+    async def get_and_close():
+        client = pool.get_client()
+        await pool.aclose()
+        return client
+
+    first = asyncio.run(get_and_close())
+    second = asyncio.run(get_and_close())
+    assert first is not second
+
+
+def test_pool_limits_from_settings(monkeypatch):
+    """Pool limits are read from settings"""
+    monkeypatch.setattr(
+        http_client, "get_settings", lambda: {"http_max_connections": 3, "http2": False}
+    )
+    client = HttpClientPool()._build_client()
+
+    assert client._transport._pool._max_connections == 3
+    asyncio.run(client.aclose())
+
+
+def test_app_lifespan_closes_pool():
+    """The application lifespan registers its loop and closes the pool on shutdown"""
+    with TestClient(app) as test_client:
+        assert http_pool.home_loop is not None
+        assert test_client.get("/health").status_code == 200
+
+    assert http_pool.home_loop is None
@@ -0,0 +1,168 @@
+"""Tests for the background job queue"""
+
+import asyncio
+
+import pytest
+
+from app.services import job_service
+from app.services.job_service import JobQueue
+
+
+@pytest.fixture
+def job_db(monkeypatch, temp_db):
+    """Point the job queue at a temporary database"""
+    monkeypatch.setattr(job_service, "db", temp_db)
+    return temp_db
+
+
+async def _wait_for_status(db, job_id, statuses, timeout=2.0):
+    """Poll until the job reaches one of the given statuses"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        job = db.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} stuck in {db.get_job(job_id)['status']}")
+
+
+def test_submit_returns_immediately_and_stores_result(job_db):
+    """Submitting persists the job; a worker runs it and stores the result"""
+
+    async def handler(params):
+        await asyncio.sleep(0.05)
+        return {"echo": params["value"]}
+
+    async def run():
+        queue = JobQueue(workers=1)
+        queue.register("echo", handler)
+        await queue.start()
+        try:
+            job_id = await queue.submit("echo", {"value": 42})
+            assert job_db.get_job(job_id)["status"] == "queued"
+            return await _wait_for_status(job_db, job_id, {"completed"})
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(run())
+    assert job["result"] == {"echo": 42}
+    assert job["finished_at"] is not None
+
+
+def test_failed_job_records_error(job_db):
+    """Exceptions raised by a handler mark the job failed"""
+
+    async def handler(_params):
+        raise RuntimeError("boom")
+
+    async def run():
+        queue = JobQueue(workers=1)
+        queue.register("broken", handler)
+        await queue.start()
+        try:
+            return await _wait_for_status(job_db, await queue.submit("broken", {}), {"failed"})
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(run())
+    assert job["error_message"] == "boom"
+
+
+def test_cancel_running_job(job_db):
+    """Cancelling interrupts a running job and it stays cancelled"""
+
+    async def run():
+        running = asyncio.Event()
+
+        async def handler(_params):
+            running.set()
+            await asyncio.sleep(10)
+            return {}
+
+        queue = JobQueue(workers=1)
+        queue.register("slow", handler)
+        await queue.start()
+        try:
+            job_id = await queue.submit("slow", {})
+            await asyncio.wait_for(running.wait(), 2)
+            assert await queue.cancel(job_id)
+            await asyncio.sleep(0.05)
+            assert not await queue.cancel(job_id)
+            return job_db.get_job(job_id)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(run())["status"] == "cancelled"
+
+
+def test_job_cancelled_before_claim_never_runs(job_db, monkeypatch):
+    """A cancel landing between the worker's read and its claim wins"""
+    calls = []
+
+    async def handler(params):
+        calls.append(params)
+        return {}
+
+    queue = JobQueue(workers=1)
+    queue.register("echo", handler)
+    job_id = asyncio.run(queue.submit("echo", {}))
+    read_job = job_db.get_job
+
+    def get_job_then_cancel(requested_id):
+        job = read_job(requested_id)
+        # What cancel() does for a queued job, run here on the database thread
+        job_db.update_job_status(requested_id, "cancelled", only_statuses=("queued",))
+        return job
+
+    monkeypatch.setattr(job_db, "get_job", get_job_then_cancel)
+    asyncio.run(queue._execute(job_id))
+
+    assert calls == []
+    assert read_job(job_id)["status"] == "cancelled"
+
+
+def test_unknown_kind_rejected(job_db):
+    """Submitting a job nobody can execute is an error"""
+    with pytest.raises(ValueError, match="Unknown job kind"):
+        asyncio.run(JobQueue().submit("nope", {}))
+
+
+def test_interrupted_jobs_resume_after_restart(job_db):
+    """Jobs running at shutdown are re-queued and completed on the next start"""
+    calls = []
+
+    async def run():
+        running = asyncio.Event()
+
+        async def handler(params):
+            calls.append(params)
+            running.set()
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return {"attempt": len(calls)}
+
+        first = JobQueue(workers=1)
+        first.register("resumable", handler)
+        await first.start()
+        job_id = await first.submit("resumable", {"n": 1})
+        await asyncio.wait_for(running.wait(), 2)
+        await first.stop()
+        assert job_db.get_job(job_id)["status"] == "queued"
+
+        second = JobQueue(workers=1)
+        second.register("resumable", handler)
+        await second.start()
+        try:
+            return await _wait_for_status(job_db, job_id, {"completed"})
+        finally:
+            await second.stop()
+
+    job = asyncio.run(run())
+    assert job["result"] == {"attempt": 2}
+    assert calls == [{"n": 1}, {"n": 1}]
+
+
+def test_get_unknown_job(client):
+    """Unknown job IDs return 404"""
+    response = client.get("/jobs/999999999")
+    assert response.status_code == 404
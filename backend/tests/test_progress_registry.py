@@ -0,0 +1,52 @@
+"""Tests for the in-memory download progress registry"""
+
+import pytest
+
+from app.services import progress_registry
+from app.services.progress_registry import ProgressRegistry
+
+
+@pytest.fixture
+def download_id(monkeypatch, temp_db):
+    """A download record in a temporary database"""
+    monkeypatch.setattr(progress_registry, "db", temp_db)
+    return temp_db.create_download(
+        file_name="test.zip",
+        file_type="cm_bhavcopy",
+        url="https://example.com/test.zip",
+        date_str="2023-12-01",
+        file_path="/tmp/test.zip",
+    )
+
+
+async def test_updates_stay_in_memory_until_threshold(download_id, temp_db):
+    """Small progress steps are not written to the database"""
+    registry = ProgressRegistry(checkpoint_interval=3600, checkpoint_step=25.0)
+    await registry.start(download_id)
+
+    assert registry.update(download_id, 10.0, 100) == False
+    assert registry.get(download_id)["progress"] == 10.0
+    assert temp_db.get_download(download_id)["progress"] == 0.0
+
+    assert registry.update(download_id, 30.0, 300) == True
+    await registry.checkpoint(download_id)
+    stored = temp_db.get_download(download_id)
+    assert stored["progress"] == 30.0
+    assert stored["bytes_downloaded"] == 300
+
+    assert registry.update(download_id, 40.0, 400) == False
+
+
+async def test_overlay_applies_live_progress(download_id, temp_db):
+    """Readers see live progress for active downloads only"""
+    registry = ProgressRegistry(checkpoint_interval=3600)
+    await registry.start(download_id)
+    registry.update(download_id, 42.0, 420)
+
+    assert registry.overlay(temp_db.get_download(download_id))["progress"] == 42.0
+
+    temp_db.update_download_status(download_id, "completed", progress=100.0)
+    assert registry.overlay(temp_db.get_download(download_id))["progress"] == 100.0
+
+    registry.finish(download_id)
+    assert registry.get(download_id) is None
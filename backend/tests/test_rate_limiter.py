@@ -1,8 +1,21 @@
 """Tests for rate limiter"""
 
+import asyncio
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from app.services.rate_limiter import RateLimiter
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    HostRateLimiter,
+    Priority,
+    RateLimiter,
+    SharedBucketStore,
+    bucket_key,
+)
 
 
 def test_rate_limiter_basic():
@@ -18,11 +31,11 @@ def test_rate_limiter_basic():
     # Second call should also proceed
     limiter.wait_if_needed()
 
-    # Third call should wait
+    # Third call should wait for a token to refill (2 per second)
     start = time.time()
     limiter.wait_if_needed()
     elapsed = time.time() - start
-    assert elapsed >= 0.9  # Should wait almost the full window
+    assert elapsed >= 0.45
 
 
 def test_rate_limiter_can_proceed():
@@ -46,3 +59,235 @@ def test_rate_limiter_resets():
     # Wait for window to expire
     time.sleep(1.1)
     assert limiter.can_proceed() == True
+
+
+def test_rate_limiter_refund():
+    """A refunded call no longer counts against the limit"""
+    limiter = RateLimiter(max_calls=1, time_window=60)
+
+    limiter.wait_if_needed()
+    assert limiter.can_proceed() == False
+
+    limiter.refund()
+    assert limiter.can_proceed() == True
+
+
+def test_async_acquire_does_not_block_event_loop():
+    """Waiting for a slot leaves the event loop free and serves waiters in order"""
+    limiter = RateLimiter(max_calls=1, time_window=0.2)
+
+    async def run():
+        order = []
+        ticks = 0
+
+        async def waiter(name):
+            await limiter.acquire()
+            order.append(name)
+
+        async def ticker():
+            nonlocal ticks
+            while len(order) < 3:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(waiter("a"), waiter("b"), waiter("c"), ticker())
+        return order, ticks
+
+    start = time.time()
+    order, ticks = asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert time.time() - start >= 0.4
+    assert ticks >= 20  # The loop kept running while b and c waited
+
+
+def test_sync_and_async_share_budget():
+    """Threads and coroutines draw from the same window"""
+    limiter = RateLimiter(max_calls=1, time_window=0.3)
+    limiter.wait_if_needed()
+
+    start = time.time()
+    asyncio.run(limiter.acquire())
+    assert time.time() - start >= 0.25
+
+
+def test_cancelled_acquire_releases_reservation():
+    """A waiter cancelled before its slot gives the slot back"""
+    limiter = RateLimiter(max_calls=1, time_window=60)
+    limiter.wait_if_needed()
+
+    async def run():
+        task = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert limiter.tokens == pytest.approx(0, abs=0.01)
+
+
+def test_burst_allows_back_to_back_calls():
+    """Up to burst calls go through immediately after an idle period"""
+    limiter = RateLimiter(max_calls=1, time_window=60, burst=3)
+
+    start = time.time()
+    for _ in range(3):
+        limiter.wait_if_needed()
+    assert time.time() - start < 0.1
+    assert limiter.can_proceed() == False
+
+
+def test_adaptive_rate():
+    """429 halves the rate; a run of successes ramps it back up to the ceiling"""
+    limiter = RateLimiter(max_calls=60, time_window=60, max_calls_ceiling=90)
+    limiter.record_response(429)
+    assert limiter.rate == pytest.approx(0.5)
+    assert limiter.can_proceed() == False
+
+    for _ in range(200):
+        limiter.record_response(200)
+    assert limiter.rate == pytest.approx(1.5)
+
+
+def test_buckets_per_host_and_path():
+    """Archives and content/historical files have separate budgets"""
+    archives = "https://www.nseindia.com/archives/equities/mto/MTO_04122023.DAT"
+    historical = "https://www.nseindia.com/content/historical/EQUITIES/2023/DEC/cm.zip"
+    assert bucket_key(archives) == "www.nseindia.com/archives"
+    assert bucket_key(historical) == "www.nseindia.com/content"
+
+    limiter = HostRateLimiter(max_calls=1, time_window=60)
+    limiter.wait_if_needed(archives)
+    assert limiter.bucket(archives).can_proceed() == False
+    assert limiter.bucket(historical).can_proceed() == True
+
+    limiter.configure(max_calls=1, time_window=60, burst=5)
+    assert limiter.bucket(historical).burst == 5
+
+
+def test_shared_store_gives_processes_one_budget(temp_db):
+    """Limiters using separate connections to one database share their tokens"""
+    first = RateLimiter(max_calls=2, time_window=60, store=SharedBucketStore(temp_db.db_path))
+    second = RateLimiter(max_calls=2, time_window=60, store=SharedBucketStore(temp_db.db_path))
+
+    first.wait_if_needed()
+    second.wait_if_needed()
+    assert first.can_proceed() == False
+    assert second.can_proceed() == False
+
+    first.record_response(429)
+    assert second.state()["calls_per_minute"] == pytest.approx(1.0)
+
+
+def test_new_limiter_keeps_shared_adapted_rate(temp_db):
+    """A process joining a shared bucket does not undo another's back-off"""
+    first = RateLimiter(max_calls=2, time_window=60, store=SharedBucketStore(temp_db.db_path))
+    first.record_response(429)
+
+    second = RateLimiter(max_calls=2, time_window=60, store=SharedBucketStore(temp_db.db_path))
+    assert second.state()["calls_per_minute"] == pytest.approx(1.0)
+    assert first.state()["calls_per_minute"] == pytest.approx(1.0)
+
+    # Explicitly changing the limits starts again from the base rate
+    second.configure(max_calls=4, time_window=60)
+    assert first.state()["calls_per_minute"] == pytest.approx(4.0)
+
+
+def test_shared_store_works_across_threads(temp_db):
+    """Concurrent acquisitions from many threads never hand out the same token"""
+    limiter = RateLimiter(max_calls=20, time_window=3600, store=SharedBucketStore(temp_db.db_path))
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: limiter.wait_if_needed(), range(20)))
+
+    assert time.time() - start < 1
+    assert limiter.state()["tokens"] == pytest.approx(0, abs=0.01)
+    assert limiter.can_proceed() == False
+
+
+def test_shared_store_contention_does_not_block_event_loop(temp_db):
+    """Waiting on another process's store transaction happens off the loop"""
+    limiter = HostRateLimiter(
+        max_calls=100, time_window=1, store=SharedBucketStore(temp_db.db_path)
+    )
+    limiter.bucket("https://example.com/a/1")
+    holding = threading.Event()
+
+    def hold_store_lock():
+        conn = sqlite3.connect(temp_db.db_path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        holding.set()
+        time.sleep(0.5)
+        conn.rollback()
+        conn.close()
+
+    async def run():
+        gaps = []
+
+        async def tick():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        ticker = asyncio.create_task(tick())
+        holder = asyncio.create_task(asyncio.to_thread(hold_store_lock))
+        await asyncio.to_thread(holding.wait)
+        # An existing bucket (several waiters) and one that still has to be created
+        await asyncio.gather(
+            *(limiter.acquire("https://example.com/a/1") for _ in range(3)),
+            limiter.acquire("https://example.com/b/1"),
+        )
+        await holder
+        ticker.cancel()
+        return max(gaps)
+
+    assert asyncio.run(run()) < 0.2
+
+
+def _served_order(limiter, lanes, gap=0.01):
+    """Queue one waiter per lane, in order, on an empty bucket; return serving order"""
+
+    async def run():
+        order = []
+
+        async def waiter(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        tasks = []
+        for name, priority in lanes:
+            tasks.append(asyncio.create_task(waiter(name, priority)))
+            await asyncio.sleep(gap)
+        await asyncio.gather(*tasks)
+        return order
+
+    limiter.wait_if_needed()
+    return asyncio.run(run())
+
+
+def test_interactive_lane_jumps_the_queue():
+    """Higher priority waiters are served before earlier lower priority ones"""
+    limiter = RateLimiter(max_calls=1, time_window=0.1)
+    order = _served_order(
+        limiter,
+        [
+            ("backfill", Priority.BACKFILL),
+            ("scheduled", Priority.SCHEDULED),
+            ("interactive", Priority.INTERACTIVE),
+        ],
+    )
+    assert order == ["interactive", "scheduled", "backfill"]
+
+
+def test_waiting_promotes_low_lanes(monkeypatch):
+    """A backfill waiter that has aged enough is no longer overtaken"""
+    monkeypatch.setattr(rate_limiter, "AGING_INTERVAL", 0.02)
+    limiter = RateLimiter(max_calls=1, time_window=0.3)
+    order = _served_order(
+        limiter, [("backfill", Priority.BACKFILL), ("interactive", Priority.INTERACTIVE)], gap=0.1
+    )
+    assert order == ["backfill", "interactive"]
@@ -0,0 +1,136 @@
+"""Tests for archival, pruning and vacuuming of the downloads table"""
+
+from datetime import date
+
+import pytest
+
+from app.services import download_service, retention_service
+from app.services.database import AUTO_VACUUM_INCREMENTAL
+from app.services.download_service import DownloadService
+from app.services.retention_service import RetentionService
+
+
+@pytest.fixture
+def retention_db(monkeypatch, temp_db):
+    """Point retention and the download service at a temporary database"""
+    monkeypatch.setattr(retention_service, "db", temp_db)
+    monkeypatch.setattr(download_service, "db", temp_db)
+    monkeypatch.setattr(
+        retention_service,
+        "get_settings",
+        lambda: {"retention_archive_after_days": 30, "retention_prune_failed_after_days": 7},
+    )
+    return temp_db
+
+
+def _add(db, date_str, file_type, status, updated_at=None):
+    download_id = db.create_download(
+        f"{file_type}_{date_str}.zip", file_type, "http://x", date_str, f"/tmp/{date_str}"
+    )
+    db.update_download_status(download_id, status)
+    if updated_at:
+        with db._get_connection() as conn:
+            conn.execute(
+                "UPDATE downloads SET updated_at = ? WHERE id = ?", (updated_at, download_id)
+            )
+            conn.commit()
+    return download_id
+
+
+def test_old_completed_downloads_are_archived(retention_db):
+    """Completed rows older than the cutoff move to the archive, others stay"""
+    _add(retention_db, "2023-10-02", "fo_udiff", "completed")
+    _add(retention_db, "2023-10-02", "cm_udiff", "failed")
+    _add(retention_db, "2023-12-01", "fo_udiff", "completed")
+
+    result = RetentionService().run_once(today=date(2023, 12, 4))
+
+    assert result["archived"] == 1
+    remaining = retention_db.get_downloads_by_date_range("2023-01-01", "2023-12-31")
+    assert [(d["date_str"], d["file_type"]) for d in remaining] == [
+        ("2023-12-01", "fo_udiff"),
+        ("2023-10-02", "cm_udiff"),
+    ]
+    archived = retention_db.get_archived_downloads("2023-10-01", "2023-10-31")
+    assert [(d["date_str"], d["file_type"]) for d in archived] == [("2023-10-02", "fo_udiff")]
+
+
+def test_failed_downloads_are_pruned(retention_db):
+    """Stale failures and failures superseded by an archived file are deleted"""
+    _add(retention_db, "2023-12-01", "fo_udiff", "failed", updated_at="2000-01-01 00:00:00")
+    kept = _add(retention_db, "2023-12-01", "cm_udiff", "failed")
+
+    result = RetentionService().run_once(today=date(2023, 12, 4))
+
+    assert result["pruned"] == 1
+    assert [d["id"] for d in retention_db.get_failed_downloads()] == [kept]
+
+
+async def test_archived_files_are_not_downloaded_again(retention_db, tmp_path):
+    """A file on disk whose record was archived still counts as downloaded"""
+    service = DownloadService()
+    output_file = service._output_path("fo_udiff", "2023-10-02", "http://x/a.zip", str(tmp_path))
+    output_file.write_bytes(b"data")
+    _add(retention_db, "2023-10-02", "fo_udiff", "completed")
+    RetentionService().run_once(today=date(2023, 12, 4))
+
+    existing = await service._find_completed(output_file, "2023-10-02")
+
+    assert existing["id"] is None
+    assert existing["file_type"] == "fo_udiff"
+
+
+def test_incremental_vacuum_frees_pages(temp_db):
+    """Pages freed by deletes are returned to the filesystem"""
+    with temp_db._get_connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+        conn.executemany(
+            "INSERT INTO not_found_cache (url, date_str) VALUES (?, '2023-12-01')",
+            [(f"http://x/{'a' * 200}{i}",) for i in range(2000)],
+        )
+        conn.execute("DELETE FROM not_found_cache")
+        conn.commit()
+
+    assert temp_db.incremental_vacuum() > 0
+
+
+def test_old_tombstones_are_pruned(retention_db):
+    """Old deletions leave the change feed; clients behind them must start over"""
+    old = _add(retention_db, "2023-12-01", "fo_udiff", "failed", updated_at="2000-01-01 00:00:00")
+    seen = retention_db.get_download_changes(0)["revision"]
+    _add(retention_db, "2023-12-01", "cm_udiff", "failed", updated_at="2000-01-01 00:00:00")
+    RetentionService().run_once(today=date(2023, 12, 4))  # Prunes both, leaving tombstones
+    with retention_db._get_connection() as conn:
+        conn.execute("UPDATE download_deletions SET deleted_at = '2023-01-01 00:00:00'")
+        conn.commit()
+
+    result = RetentionService().run_once(today=date(2023, 12, 4))
+
+    assert result["pruned_deletions"] == 2
+    changes = retention_db.get_download_changes(seen)
+    assert changes["stale"] == True
+    assert old not in changes["deleted"]
+    assert retention_db.get_download_changes(changes["revision"])["stale"] == False
+
+
+def test_stale_verification_cache_is_pruned(retention_db, tmp_path):
+    """Cached verifications older than the cutoff or for missing files are dropped"""
+    kept = tmp_path / "kept.zip"
+    kept.write_bytes(b"data")
+    entries = [
+        {"file_path": str(path), "size_bytes": 4, "mtime_ns": 1, "sha256": None, "result": {}}
+        for path in (kept, tmp_path / "gone.zip", tmp_path / "old.zip")
+    ]
+    (tmp_path / "old.zip").write_bytes(b"data")
+    retention_db.save_verifications(entries)
+    with retention_db._get_connection() as conn:
+        conn.execute(
+            "UPDATE verification_cache SET verified_at = '2023-01-01 00:00:00' WHERE file_path = ?",
+            (str(tmp_path / "old.zip"),),
+        )
+        conn.commit()
+
+    result = RetentionService().run_once(today=date(2023, 12, 4))
+
+    assert result["pruned_verifications"] == 2
+    assert retention_db.get_verification_paths() == [str(kept)]
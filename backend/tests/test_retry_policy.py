@@ -0,0 +1,108 @@
+"""Tests for the retry policy and circuit breaker"""
+
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from app.services.retry_policy import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+)
+
+
+def test_classification():
+    """Timeouts, 429 and 5xx are transient; 404 is permanent"""
+    policy = RetryPolicy()
+    assert policy.is_retryable(503)
+    assert policy.is_retryable(429)
+    assert not policy.is_retryable(404)
+    assert policy.is_retryable(error=httpx.ReadTimeout("slow"))
+    assert policy.is_retryable(error=httpx.ConnectError("refused"))
+    assert not policy.is_retryable(error=OSError("disk full"))
+
+
+def test_backoff_grows_and_is_capped():
+    """Delays use full jitter below an exponentially growing, bounded cap
+
+    Retry-After is honoured; one longer than the cap means no retry now.
+    """
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for _ in range(50):
+        assert 0 <= policy.delay(1) <= 1.0
+        assert 0 <= policy.delay(3) <= 4.0
+        assert 0 <= policy.delay(10) <= 5.0
+    assert policy.delay(1, retry_after=3.0) == 3.0
+    assert policy.delay(1, retry_after=120.0) is None
+
+
+def test_parse_retry_after():
+    """Retry-After may be delta seconds or an HTTP date"""
+    assert parse_retry_after("7") == 7.0
+    assert 25 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """The circuit opens at the threshold and a successful trial closes it"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure("nse")
+    assert breaker.seconds_until_allowed("nse") == 0
+    breaker.record_failure("nse")
+    assert breaker.seconds_until_allowed("nse") > 0
+    assert breaker.seconds_until_allowed("other") == 0
+
+    time.sleep(0.06)
+    assert breaker.seconds_until_allowed("nse") == 0  # Trial request
+    assert breaker.seconds_until_allowed("nse") > 0  # Others wait for the trial
+    breaker.record_success("nse")
+    assert not breaker.is_open("nse")
+
+
+def test_failed_trial_reopens_circuit():
+    """A failing trial request opens the circuit again straight away"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure("nse")
+    time.sleep(0.06)
+    assert breaker.seconds_until_allowed("nse") == 0
+    breaker.record_failure("nse")
+    assert breaker.is_open("nse")
+    with pytest.raises(CircuitOpenError):
+        breaker.seconds_until_allowed("nse")
+
+
+def test_released_trial_lets_next_request_through():
+    """A trial that ended without an answer does not block the host forever"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure("nse")
+    time.sleep(0.06)
+    assert breaker.seconds_until_allowed("nse") == 0
+    assert breaker.seconds_until_allowed("nse") > 0
+    breaker.release_trial("nse")
+    assert breaker.seconds_until_allowed("nse") == 0
+
+
+def test_failed_trial_fails_waiting_requests_fast():
+    """Requests waiting for a trial that fails do not wait for a trial of their own"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure("nse")
+    openings = breaker.openings("nse")
+    assert breaker.seconds_until_allowed("nse", openings) > 0
+
+    time.sleep(0.06)
+    assert breaker.seconds_until_allowed("nse") == 0  # Trial request
+    breaker.record_failure("nse")
+
+    with pytest.raises(CircuitOpenError):
+        breaker.seconds_until_allowed("nse", openings)
+    with pytest.raises(CircuitOpenError):
+        breaker.seconds_until_allowed("nse")  # New requests fail fast too
+
+    time.sleep(0.06)
+    assert breaker.seconds_until_allowed("nse") == 0  # Next trial
+    breaker.record_success("nse")
+    assert breaker.seconds_until_allowed("nse") == 0
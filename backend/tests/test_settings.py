@@ -95,3 +95,18 @@ def test_settings_roundtrip():
         saved_settings = data["settings"]
         assert saved_settings.get("raw_path") == settings["raw_path"]
         assert saved_settings.get("scheduler") == settings["scheduler"]
+
+
+def test_rate_limit_can_be_changed_at_runtime():
+    """The rate limit is applied immediately and reported back"""
+    try:
+        response = client.post("/settings/rate-limit", json={"max_calls": 10, "burst": 3})
+        data = response.json()
+        assert data["success"] == True
+        assert data["config"]["max_calls"] == 10
+        assert data["config"]["burst"] == 3
+
+        assert client.get("/settings/rate-limit").json()["config"]["max_calls"] == 10
+        assert client.post("/settings/rate-limit", json={"max_calls": 0}).json()["success"] == False
+    finally:
+        client.post("/settings/rate-limit", json={"max_calls": 5})
@@ -0,0 +1,51 @@
+"""Tests for the NSE trading calendar"""
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.services import trading_calendar
+from app.services.trading_calendar import TradingCalendar
+
+
+@pytest.fixture
+def calendar(monkeypatch, temp_db):
+    """Trading calendar backed by a temporary database"""
+    monkeypatch.setattr(trading_calendar, "db", temp_db)
+    return TradingCalendar(holidays=["2023-12-25"])
+
+
+def test_weekends_and_holidays_are_not_trading_days(calendar):
+    """Saturdays, Sundays and configured holidays are skipped"""
+    assert calendar.is_trading_day(date(2023, 12, 22)) == True
+    assert calendar.is_trading_day(date(2023, 12, 23)) == False
+    assert calendar.is_trading_day(date(2023, 12, 24)) == False
+    assert calendar.is_trading_day(date(2023, 12, 25)) == False
+
+
+def test_trading_days_in_range(calendar):
+    """trading_days returns only the days the exchange is open"""
+    days = calendar.trading_days(date(2023, 12, 22), date(2023, 12, 27))
+    assert days == [date(2023, 12, 22), date(2023, 12, 26), date(2023, 12, 27)]
+
+
+def test_previous_trading_day(calendar):
+    """previous_trading_day skips back over weekends and holidays"""
+    assert calendar.previous_trading_day(date(2023, 12, 26)) == date(2023, 12, 22)
+    assert calendar.previous_trading_day(date(2023, 12, 27)) == date(2023, 12, 26)
+
+
+def test_learns_holiday_from_repeated_misses(calendar):
+    """A weekday on which every file is missing twice becomes a holiday"""
+    assert calendar.record_all_missing("2023-11-27") == False
+    assert calendar.is_trading_day(date(2023, 11, 27)) == True
+
+    assert calendar.record_all_missing("2023-11-27") == True
+    assert calendar.is_trading_day(date(2023, 11, 27)) == False
+
+
+def test_recent_dates_are_not_learned(calendar):
+    """Files for recent dates may not be published yet, so they are never learned"""
+    today = datetime.now(timezone.utc).date().isoformat()
+    for _ in range(5):
+        assert calendar.record_all_missing(today) == False
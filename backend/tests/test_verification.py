@@ -1,12 +1,16 @@
 """Tests for verification service"""
 
+import json
+import os
 import shutil
 import tempfile
+import threading
 import zipfile
 from pathlib import Path
 
 import pytest
 
+from app.services import verification_service
 from app.services.verification_service import VerificationService
 
 
@@ -86,3 +90,86 @@ def test_verify_nonexistent_file():
 
     assert result["valid"] == False
     assert "error" in result
+
+
+async def test_unchanged_files_are_not_verified_again(monkeypatch, temp_db, temp_files):
+    """A second pass reuses stored results until the file changes"""
+    monkeypatch.setattr(verification_service, "db", temp_db)
+    raw_dir = Path(temp_files["dir"]) / "raw"
+    raw_dir.mkdir()
+    zip_path = raw_dir / "fo.zip"
+    shutil.copy(temp_files["valid_zip"], zip_path)
+    temp_db.create_download("fo.zip", "fo_udiff", "http://x", "2023-12-01", str(zip_path))
+
+    service = VerificationService()
+    calls = []
+    verify_zip_file = service.verify_zip_file
+    monkeypatch.setattr(
+        service, "verify_zip_file", lambda path: calls.append(path) or verify_zip_file(path)
+    )
+
+    first = await service.verify_downloads("2023-12-01", "2023-12-01", str(raw_dir))
+    second = await service.verify_downloads("2023-12-01", "2023-12-01", str(raw_dir))
+
+    assert first["verified_count"] == second["verified_count"] == 1
+    assert (first["cached_count"], second["cached_count"]) == (0, 1)
+    assert second["verified_files"][0]["verification"]["file_count"] == 1
+    assert len(calls) == 1
+
+    stat = zip_path.stat()
+    os.utime(zip_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    third = await service.verify_downloads("2023-12-01", "2023-12-01", str(raw_dir))
+
+    assert third["cached_count"] == 0
+    assert len(calls) == 2
+
+
+def _add_zips(db, raw_dir, source, dates):
+    """Copy a zip into raw_dir once per date and record each as a download"""
+    raw_dir.mkdir()
+    for date_str in dates:
+        zip_path = raw_dir / f"fo_{date_str}.zip"
+        shutil.copy(source, zip_path)
+        db.create_download(zip_path.name, "fo_udiff", "http://x", date_str, str(zip_path))
+
+
+async def test_files_are_verified_on_worker_threads(monkeypatch, temp_db, temp_files):
+    """Checks run on the verification pool and results keep the download order"""
+    monkeypatch.setattr(verification_service, "db", temp_db)
+    raw_dir = Path(temp_files["dir"]) / "raw"
+    dates = ["2023-12-01", "2023-12-04", "2023-12-05"]
+    _add_zips(temp_db, raw_dir, temp_files["valid_zip"], dates)
+
+    service = VerificationService(workers=3)
+    threads = set()
+    verify_zip_file = service.verify_zip_file
+    monkeypatch.setattr(
+        service,
+        "verify_zip_file",
+        lambda path: threads.add(threading.current_thread().name) or verify_zip_file(path),
+    )
+
+    result = await service.verify_downloads("2023-12-01", "2023-12-05", str(raw_dir))
+
+    assert result["verified_count"] == 3
+    assert [f["date_str"] for f in result["verified_files"]] == sorted(dates, reverse=True)
+    assert threads
+    assert all(name.startswith("homestock-verify") for name in threads)
+
+
+def test_verify_stream_endpoint(monkeypatch, client, temp_db, temp_files):
+    """The streaming endpoint sends one line per file, then the summary"""
+    monkeypatch.setattr(verification_service, "db", temp_db)
+    raw_dir = Path(temp_files["dir"]) / "raw"
+    _add_zips(temp_db, raw_dir, temp_files["valid_zip"], ["2023-12-01", "2023-12-04"])
+    params = {"start_date": "2023-12-01", "end_date": "2023-12-04", "raw_path": str(raw_dir)}
+
+    response = client.post("/pipeline/verify-stream", params=params)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["type"] for e in events] == ["file", "file", "summary"]
+    assert all(e["verification"]["valid"] for e in events[:2])
+    assert events[-1]["verified_count"] == 2
+    assert events[-1]["all_valid"] is True
@@ -46,26 +46,35 @@ const Downloads = () => {
     }
   };
 
+  const applyChanges = (current, changes) => {
+    const byId = new Map(changes.reset ? [] : current.map((d) => [d.id, d]));
+    changes.deleted.forEach((id) => byId.delete(id));
+    changes.downloads.forEach((d) => byId.set(d.id, { ...byId.get(d.id), ...d }));
+    return [...byId.values()].sort(
+      (a, b) => b.date_str.localeCompare(a.date_str) || a.file_type.localeCompare(b.file_type)
+    );
+  };
+
   const startPolling = (start, end) => {
     if (pollingInterval) {
       clearInterval(pollingInterval);
     }
 
+    let revision = 0;
     const interval = setInterval(async () => {
-      await loadDownloadStatus(start, end);
+      const changes = await downloadsAPI.getChanges(start, end, revision);
+      if (!changes.success || changes.unchanged) {
+        return;
+      }
+      revision = changes.revision;
+      setDownloads((current) => applyChanges(current, changes));
       
-      const data = await downloadsAPI.getStatus(start, end);
-      if (data.success) {
-        const activeDownloads = data.downloads.filter(
-          (d) => d.status === 'pending' || d.status === 'downloading'
-        );
-        
-        if (activeDownloads.length === 0) {
-          clearInterval(interval);
-          setPollingInterval(null);
-          setStatus({ message: 'All downloads completed!', type: 'success' });
-          setTimeout(() => setStatus({ message: '', type: '' }), 5000);
-        }
+      // active comes from the same snapshot as the changes just applied
+      if (changes.active === 0) {
+        clearInterval(interval);
+        setPollingInterval(null);
+        setStatus({ message: 'All downloads completed!', type: 'success' });
+        setTimeout(() => setStatus({ message: '', type: '' }), 5000);
       }
     }, 2000);
 
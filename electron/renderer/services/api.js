@@ -18,7 +18,11 @@ export const dashboardAPI = {
       urls: {},
       raw_path: '',
     });
-    return response.data;
+    if (!response.data.success) {
+      return response.data;
+    }
+    const job = await jobsAPI.waitFor(response.data.job_id);
+    return { success: job.status === 'completed', error: job.error_message, ...job.result };
   },
   runFullAutomation: async () => {
     const response = await api.post('/run-full/');
@@ -26,10 +30,64 @@ export const dashboardAPI = {
   },
 };
 
+// Jobs API
+export const jobsAPI = {
+  get: async (jobId) => {
+    const response = await api.get(`/jobs/${jobId}`);
+    return response.data;
+  },
+  cancel: async (jobId) => {
+    const response = await api.post(`/jobs/${jobId}/cancel`);
+    return response.data;
+  },
+  waitFor: async (jobId, intervalMs = 1000) => {
+    for (;;) {
+      const { job } = await jobsAPI.get(jobId);
+      if (!['queued', 'running'].includes(job.status)) {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
+};
+
 // Downloads API
 export const downloadsAPI = {
   getStatus: async (startDate, endDate) => {
-    const response = await api.get(`/download/status?start_date=${startDate}&end_date=${endDate}`);
+    const fields = 'id,file_name,file_type,date_str,status,progress,error_message';
+    const downloads = [];
+    let cursor = null;
+    do {
+      const response = await api.get('/download/status', {
+        params: { start_date: startDate, end_date: endDate, fields, cursor },
+      });
+      if (!response.data.success) {
+        return response.data;
+      }
+      downloads.push(...response.data.downloads);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return { success: true, downloads };
+  },
+  getChanges: async (startDate, endDate, since) => {
+    const response = await api.get('/download/changes', {
+      params: {
+        start_date: startDate,
+        end_date: endDate,
+        since,
+        fields: 'id,file_name,file_type,date_str,status,progress,error_message',
+      },
+      validateStatus: (status) => status === 200 || status === 304,
+    });
+    if (response.status === 304) {
+      return { success: true, unchanged: true, revision: since, downloads: [], deleted: [] };
+    }
+    return response.data;
+  },
+  getSummary: async (startDate, endDate) => {
+    const response = await api.get('/download/summary', {
+      params: { start_date: startDate, end_date: endDate },
+    });
     return response.data;
   },
   downloadMissing: async (startDate, endDate, urls, rawPath) => {